@@ -3,38 +3,125 @@
 # CONFIG
 TYPES = ['comp', 'lighting', 'anim', 'source']
 DEFAULT_TYPE = 'source'
+# Shown in the User column while the file owner is being resolved
+OWNER_PLACEHOLDER = '...'
+# Save the clip automatically, AUTOSAVE_DELAY ms after the last change.
+AUTOSAVE = False
+AUTOSAVE_DELAY = 2000
+# Record every edit in a .journal file next to the clip, replayed if Nuke
+# dies before the clip is saved. The journal is folded into the clip when
+# saving, on close, or once it grows past JOURNAL_COMPACT_SIZE bytes.
+JOURNAL = True
+JOURNAL_COMPACT_SIZE = 1024 * 1024
+# Add Asset also adds the Read nodes inside the selected Groups and
+# Backdrops.
+ADD_ASSET_GROUPS = True
+# Create Read Node also wires the Read nodes into a ContactSheet.
+READ_CONTACT_SHEET = False
+# Versions of each type Prune Versions keeps by default.
+PRUNE_KEEP = 5
+# Removals spanning more runs of rows than this reset the views instead of
+# signalling each run.
+MAX_REMOVE_RUNS = 100
 
 import os
+import sys
 
 # You may define a default path to find the .clip file here
 # As this is a function, you have access to environment variables.
 def getClip():
   raise Exception("No suitable default location")
 
+# Command line use doesn't need PySide, see clipCli.py
+if __name__ == "__main__" and len(sys.argv) > 1:
+  import clipCli
+  sys.exit(clipCli.main(sys.argv[1:], getClip, DEFAULT_TYPE))
+
 # Implementation
 
 import PySide.QtCore as QtCore
 import PySide.QtGui as QtGui
-from debug import debug
+from debug import debug, trace, info, warning, enabled, traced, profiling, dumpStats, DEBUG
 import functools
-import uuid
-try:
-  import lxml.etree as ET
-  debug("Using lxml")
-except Exception as e:
-  from xml.etree import ElementTree as ET
-  debug("Using python xml : %s" % e)
-import datetime
 import string
-import pwd
-import sys
+import threading
+from clipCli import Asset
+from clipDocument import ET, ClipDocument, clipPath, versionName, parseDate, splitFrameRange
+from clipJournal import ClipJournal
+from framePath import parseFramePath
+from frameVerifier import FrameVerifier, mergeStatuses
 from identityModel import MyIdentityProxyModel
+from ownerResolver import OwnerResolver, UNKNOWN as UNKNOWN_OWNER
+from sequenceScanner import findSequences
 try:
   import nuke
   nukeImported = True
 except:
   nukeImported = False
 
+# Role of the typed values the sorted views compare, see sortKey.
+SORT_ROLE = QtCore.Qt.UserRole + 1
+
+def ask(message):
+  if nukeImported:
+    return nuke.ask(message)
+  buttons = QtGui.QMessageBox.Yes | QtGui.QMessageBox.No
+  return QtGui.QMessageBox.question(None, "Open Clip", message, buttons) == QtGui.QMessageBox.Yes
+
+# The Read nodes among nodes, and with groups those inside Groups and
+# Backdrops, each once.
+def readNodes(nodes, groups = False):
+  found = []
+  visited = []
+  def visit(node):
+    if node in visited:
+      return
+    visited.append(node)
+    if node.Class() == "Read":
+      found.append(node)
+    elif groups and node.Class() == "Group":
+      for child in node.nodes():
+        visit(child)
+    elif groups and node.Class() == "BackdropNode":
+      for child in backdropNodes(node):
+        visit(child)
+  for node in nodes:
+    visit(node)
+  return found
+
+# The nodes lying on a backdrop, the ones moving it drags along.
+def backdropNodes(backdrop):
+  left, top = backdrop.xpos(), backdrop.ypos()
+  right, bottom = left + backdrop['bdwidth'].value(), top + backdrop['bdheight'].value()
+  return [node for node in nuke.allNodes() if node is not backdrop and
+          left <= node.xpos() and node.xpos() + node.screenWidth() <= right and
+          top <= node.ypos() and node.ypos() + node.screenHeight() <= bottom]
+
+# The assets of Read nodes. The knobs are read first, then the sequences
+# looked up on disk in parallel. Frames missing on disk are left out of
+# the spans, when the sequence can be found at all.
+def readNodeAssets(nodes):
+  reads = [(node['file'].value(), int(node['origfirst'].value()), int(node['origlast'].value())) for node in nodes]
+  assets = []
+  for (path, first, last), sequence in zip(reads, findSequences([path for path, first, last in reads])):
+    pathVal = clipPath(path, first, last)
+    if sequence is not None:
+      sequence = sequence.clipped(first, last)
+    assets.append(Asset(sequence.span_paths() if sequence is not None else [pathVal], versionName(pathVal)))
+  return assets
+
+# Compares the SORT_ROLE values as Python values, Qt only knows how to
+# compare the types it has variants for.
+class SortProxyModel(QtGui.QSortFilterProxyModel):
+  def __init__(self, parent = None):
+    QtGui.QSortFilterProxyModel.__init__(self, parent)
+    self.setSortRole(SORT_ROLE)
+    self.setDynamicSortFilter(True)
+
+  def lessThan(self, left, right):
+    source = self.sourceModel()
+    return source.data(left, SORT_ROLE) < source.data(right, SORT_ROLE)
+
 class DeselectableTableView(QtGui.QTableView):
   def mousePressEvent(self, event):
     self.clearSelection()
@@ -56,7 +143,6 @@ class MyComboBox(QtGui.QComboBox):
 class OpenClipWindow(QtGui.QWidget):
   def __init__(self, parent=None):
     QtGui.QWidget.__init__(self, parent)
-    self.dirty = False
     self.file_changed  = False
     try:
       self.filename = getClip()
@@ -67,44 +153,47 @@ class OpenClipWindow(QtGui.QWidget):
       QtCore.QTimer.singleShot(0, self, QtCore.SLOT('close()'))
       return
     try:
-      xml = ET.parse(self.filename)
-      #watcher = QtCore.QFileSystemWatcher([self.filename], self)
-      #watcher.fileChanged.connect(self.handleFileChange)
+      document = ClipDocument.load(self.filename)
     except Exception as e:
       debug(e)
-      root = ET.Element('clip')
-      root.attrib['type'] = 'clip'
-      root.attrib['version'] = '4'
-      tracks = ET.SubElement(root, 'tracks')
-      tracks.attrib['type'] = 'tracks'
-      versions = ET.SubElement(root, 'versions')
-      versions.attrib['type'] = 'versions'
-      track = ET.SubElement(tracks, 'track')
-      track.attrib['type'] = 'track'
-      track.attrib['uid'] = str(uuid.uuid1())
-      trackType = ET.SubElement(track, 'trackType')
-      trackType.text = 'video'
-      feeds = ET.SubElement(track, 'feeds')
-      xml = ET.ElementTree(root)
-    self.xml_model = OpenClipModel(xml, parent = self)
+      document = ClipDocument(filename = self.filename)
+    self.journal = ClipJournal(self.filename) if JOURNAL else None
+    if self.journal is not None:
+      replayed = self.journal.replay(document)
+      if replayed is None:
+        warning("The journal of %s doesn't match the clip anymore, it was left aside", self.filename)
+      elif replayed > 0:
+        info("Replayed %d unsaved edits of %s", replayed, self.filename)
+    self.xml_model = OpenClipModel(document, parent = self)
+    self.xml_model.journal = self.journal
+    self.saver = ClipSaver(self.xml_model, self.filename, parent = self)
+    self.watcher = QtCore.QFileSystemWatcher(self)
+    self.watchFile()
+    self.watcher.fileChanged.connect(self.handleFileChange)
+    self.saver.saved.connect(self.fileSaved)
+    if AUTOSAVE:
+      self.xml_model.modified.connect(self.saver.schedule)
+    self.xml_model.modified.connect(self.checkpoint)
     QtGui.QVBoxLayout(self)
     #self.xml_model.dataChanged.connect(self.savexml)
     trackNameEdit = QtGui.QLineEdit(self)
-    trackNameMapper = QtGui.QDataWidgetMapper(self)
-    trackNameMapper.setModel(self.xml_model)
-    trackNameMapper.addMapping(trackNameEdit, 1)
-    trackIdx = self.xml_model.track_index()
-    trackNameMapper.setRootIndex(trackIdx)
-    trackNameMapper.setCurrentModelIndex(self.xml_model.track_name_index(trackIdx))
-    trackNameMapper.setSubmitPolicy(QtGui.QDataWidgetMapper.AutoSubmit)
+    self.trackNameMapper = QtGui.QDataWidgetMapper(self)
+    self.trackNameMapper.setModel(self.xml_model)
+    self.trackNameMapper.addMapping(trackNameEdit, 1)
+    self.trackNameMapper.setSubmitPolicy(QtGui.QDataWidgetMapper.AutoSubmit)
+    self.mapTrackName()
+    # Video and audio, or stereo eyes, are tracks of their own.
+    self.tracksCombo = QtGui.QComboBox(self)
+    self.updateTracks()
+    self.tracksCombo.currentIndexChanged.connect(self.xml_model.set_track)
+    self.xml_model.trackChanged.connect(lambda track: self.mapTrackName())
     formWidget = QtGui.QWidget(self)
     form = QtGui.QFormLayout(formWidget)
     self.myTable = DeselectableTableView()
     tableModel = OpenClipFeedsProxyModel(self)
     tableModel.setSourceModel(self.xml_model)
-    sortedTableModel = QtGui.QSortFilterProxyModel(self)
+    sortedTableModel = SortProxyModel(self)
     sortedTableModel.setSourceModel(tableModel)
-    sortedTableModel.setDynamicSortFilter(True)
     self.myTable.setModel(sortedTableModel)
     self.myTable.setSortingEnabled(True)
     self.myTable.setColumnHidden(5, True)
@@ -115,18 +204,21 @@ class OpenClipWindow(QtGui.QWidget):
     self.versionsCombo = QtGui.QComboBox(self)
     versionsModel = OpenClipVersionProxyModel(self)
     versionsModel.setSourceModel(self.xml_model)
-    sortedVersionsModel = QtGui.QSortFilterProxyModel(self)
+    sortedVersionsModel = SortProxyModel(self)
     sortedVersionsModel.setSourceModel(versionsModel)
-    sortedVersionsModel.setDynamicSortFilter(True)
     sortedVersionsModel.sort(0, QtCore.Qt.DescendingOrder)
     self.versionsCombo.setModel(sortedVersionsModel)
     self.versionsCombo.setModelColumn(1)
     self.versionsCombo.currentIndexChanged.connect(self.xml_model.change_version)
-    self.xml_model.dataChanged.connect(self.setCurrentVersion)
+    # The views react once per turn of the event loop, however many
+    # changes a bulk operation made.
+    self.changes = ChangeCoalescer(self.xml_model, self)
+    self.changes.settled.connect(self.modelSettled)
     self.setCurrentVersion()
     self.addAssetBtn = QtGui.QPushButton("Add Asset", parent = self)
     if not nukeImported:
         self.addAssetBtn.setEnabled(False)
+    form.addRow("Track", self.tracksCombo)
     form.addRow("Track Name", trackNameEdit)
     groupbox = QtGui.QGroupBox("Edit Values", parent = self)
     groupbox.setEnabled(False)
@@ -170,30 +262,102 @@ class OpenClipWindow(QtGui.QWidget):
     self.layout().addWidget(groupbox)
     self.layout().addWidget(self.myTable)
     self.myTable.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
-    self.myTable.setSelectionMode(QtGui.QAbstractItemView.SingleSelection)
+    self.myTable.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
     self.myTableSelectionModel = self.myTable.selectionModel()
     self.myTableSelectionModel.selectionChanged.connect(self.changeForm)
     self.addAssetBtn.clicked.connect(self.addAsset)
+    removeBtn = QtGui.QPushButton("Remove Selected Versions", self)
+    self.layout().addWidget(removeBtn)
+    removeBtn.clicked.connect(self.removeVersions)
+    pruneBtn = QtGui.QPushButton("Prune Versions", self)
+    self.layout().addWidget(pruneBtn)
+    pruneBtn.clicked.connect(self.pruneVersions)
+    # Reads never write the defaults shown for missing values, this does.
+    normalizeBtn = QtGui.QPushButton("Write Default Values", self)
+    self.layout().addWidget(normalizeBtn)
+    normalizeBtn.clicked.connect(self.normalize)
+    # Fills the Status column in, checking every frame on disk.
+    verifyBtn = QtGui.QPushButton("Verify Frames", self)
+    self.layout().addWidget(verifyBtn)
+    verifyBtn.clicked.connect(self.verifyFrames)
     saveXmlBtn = QtGui.QPushButton("Save Clip", self)
     self.layout().addWidget(saveXmlBtn)
     saveXmlBtn.clicked.connect(self.savexml)
     self.layout().addWidget(self.myTree)
+    if profiling:
+      QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Alt+Shift+P"), self, dumpStats)
 
   def addAsset(self):
-    index = self.xml_model.addAsset()
-    self.myTable.setCurrentIndex(self.myTable.model().mapFromSource(self.myTable.model().sourceModel().index(index, 1, QtCore.QModelIndex())))
+    rows = self.xml_model.addAsset(ADD_ASSET_GROUPS)
+    if not rows:
+      return
+    table = self.myTable.model()
+    selection = QtGui.QItemSelection()
+    for row in rows:
+      idx = table.mapFromSource(table.sourceModel().index(row, 1, QtCore.QModelIndex()))
+      selection.select(idx, idx)
+    selectionModel = self.myTable.selectionModel()
+    selectionModel.setCurrentIndex(idx, QtGui.QItemSelectionModel.NoUpdate)
+    selectionModel.select(selection, QtGui.QItemSelectionModel.ClearAndSelect | QtGui.QItemSelectionModel.Rows)
+    self.myTable.scrollTo(idx)
+
+  def removeVersions(self):
+    table = self.myTable.model()
+    feeds = table.sourceModel()
+    uids = [feeds.feed(table.mapToSource(idx).row()).get('vuid') for idx in self.myTable.selectionModel().selectedRows()]
+    if uids and ask('Remove %d version(s) and their feeds from the clip ?' % len(uids)):
+      self.myTable.clearSelection()
+      self.xml_model.remove_versions(uids)
+
+  def pruneVersions(self):
+    keep, ok = QtGui.QInputDialog.getInt(self, "Prune Versions", "Versions to keep per type :", PRUNE_KEEP, 1)
+    if not ok:
+      return
+    uids = self.xml_model.document.superseded_versions(keep)
+    if uids and ask('Remove %d superseded version(s) from the clip ?' % len(uids)):
+      self.myTable.clearSelection()
+      self.xml_model.remove_versions(uids)
+
+  def normalize(self):
+    self.myTable.clearSelection()
+    self.xml_model.normalize(self.myTable.model().sourceModel().known_owners())
+
+  def verifyFrames(self):
+    self.myTable.model().sourceModel().verify()
 
   def change_type(self, index):
     idx = self.groupBoxMapper.currentIndex()
     qidx = self.groupBoxMapper.model().index(idx, 2, QtCore.QModelIndex())
     self.groupBoxMapper.model().setData(qidx, TYPES[index], QtCore.Qt.DisplayRole)
 
+  @QtCore.Slot(object, bool)
+  def modelSettled(self, ranges, structural):
+    self.setCurrentVersion()
+    self.updateTracks()
+    # The track is gone after a reset, the mapper would show nothing.
+    if structural and not self.trackNameMapper.rootIndex().isValid():
+      self.mapTrackName()
+
+  def updateTracks(self):
+    names = self.xml_model.track_names()
+    if names != [self.tracksCombo.itemText(i) for i in range(self.tracksCombo.count())]:
+      oldstate = self.tracksCombo.blockSignals(True)
+      self.tracksCombo.clear()
+      self.tracksCombo.addItems(names)
+      self.tracksCombo.blockSignals(oldstate)
+    self.tracksCombo.setCurrentIndex(self.xml_model.track)
+    self.tracksCombo.setEnabled(len(names) > 1)
+
+  def mapTrackName(self):
+    trackIdx = self.xml_model.track_index()
+    self.trackNameMapper.setRootIndex(trackIdx)
+    self.trackNameMapper.setCurrentModelIndex(self.xml_model.track_name_index(trackIdx))
+
   def setCurrentVersion(self):
     versionsIdx = self.xml_model.sub_idx("versions")
-    if 'currentVersion' not in versionsIdx.internalPointer()._inner.attrib:
+    versionIdx = self.xml_model.current_version_index()
+    if not versionIdx.isValid():
       return
-    uid = versionsIdx.internalPointer()._inner.attrib['currentVersion']
-    versionIdx = self.xml_model.sub_idx("version", parent = versionsIdx, dict = { "uid": uid })
     oldstate = self.versionsCombo.blockSignals(True)
     self.versionsCombo.setCurrentIndex(self.xml_model.rowCount(versionsIdx) - 1 - versionIdx.row())
     self.versionsCombo.blockSignals(oldstate)
@@ -211,57 +375,77 @@ class OpenClipWindow(QtGui.QWidget):
     else:
       self.groupBoxMapper.parent().setEnabled(False)
 
+  def closeEvent(self, event):
+    if hasattr(self, 'saver'):
+      journal = self.journal is not None and self.dirty
+      if self.saver.timer.isActive() or journal:
+        self.saver.save()
+      # The journal is only compacted once the save is done.
+      while journal and self.saver.busy():
+        self.saver.wait()
+        QtCore.QCoreApplication.processEvents()
+    # Not built when the clip dialog was cancelled.
+    if hasattr(self, 'myTable'):
+      self.myTable.model().sourceModel().owners.close()
+    QtGui.QWidget.closeEvent(self, event)
+
+  # Folds a journal grown past JOURNAL_COMPACT_SIZE into the clip.
+  def checkpoint(self):
+    if self.journal is not None and self.journal.size > JOURNAL_COMPACT_SIZE and not self.saver.busy():
+      self.saver.save()
+
+  @property
+  def dirty(self):
+    return self.xml_model.document.dirty
+
   def savexml(self):
-      debug(self.filename)
-      try:
-        os.makedirs(os.path.dirname(self.filename))
-      except:
-        pass
-      with open(self.filename, 'w') as f:
-        try:
-          debug("Writing with lxml")
-          self.xml_model._xml.write(f, pretty_print=True)
-        except Exception as e:
-          debug("Writing with python xml : %s" % e)
-          self.xml_model._xml.write(f)
+      self.saver.save()
+
+  # Files replaced by a rename (as our own saves do) are dropped by the
+  # watcher, they have to be watched again.
+  def watchFile(self):
+    if self.filename not in self.watcher.files() and os.path.exists(self.filename):
+      self.watcher.addPath(self.filename)
+
+  @QtCore.Slot(str, object)
+  def fileSaved(self, filename, error):
+    self.watchFile()
+    self.handleFileChange(filename)
 
   @QtCore.Slot(str)
   def handleFileChange(self, path):
-    if self.dirty:
+    self.watchFile()
+    # Checked again once the save is done, its signature isn't known yet.
+    if self.saver.busy():
+      return
+    if self.dirty or not self.xml_model.document.changed_on_disk():
       return
     if not self.file_changed:
       self.file_changed = True
-      if nuke.ask('The clip file has changed outside of nuke. Would you like to load the updated version ?'):
-        self._xml = ET.parse(self.filename)
-        self.xml_model.dataChanged.emit()
+      if ask('The clip file has changed outside of nuke. Would you like to load the updated version ?'):
+        try:
+          other = ClipDocument.load(self.filename)
+        except Exception as e:
+          # Most likely still being written, we'll hear from it again.
+          warning("Couldn't reload %s : %s", self.filename, e)
+        else:
+          self.xml_model.update_from(other)
+          if self.journal is not None:
+            self.journal.compact(other.signature[2], self.journal.mark())
       self.file_changed = False
 
   def createReadNode(self):
-    pathIndex = self.myTable.selectionModel().selectedRows(6)[0]
-    path = self.myTable.model().data(pathIndex, QtCore.Qt.DisplayRole)
-    frames, padding, startIndex, endIndex = getFramePath(path)
-    realPath = frames.format(f = "#" * padding)
-    readNode = nuke.nodes.Read(file=realPath)
-    readNode['origfirst'].setValue(startIndex)
-    readNode['first'].setValue(startIndex)
-    readNode['origlast'].setValue(endIndex)
-    readNode['last'].setValue(endIndex)
-
-def getFramePath(path):
-  try:
-    basenameParts = path.split(".")
-    framesSpec = basenameParts[-2]
-    if framesSpec[0] == "[" and framesSpec[-1] == "]" and len(framesSpec[1:-1].split("-")) == 2:
-      frames = framesSpec[1:-1].split("-")
-    else:
-      frames = [framesSpec, framesSpec]
-    padding = len(frames[0])
-    frames = map(int, frames)
-    basenameParts[-2] = "{f:0>" + str(padding) + "}"
-    return ".".join(basenameParts), padding, frames[0], frames[1]
-  except Exception as e:
-    debug(e)
-    return path, 0, 1, 1
+    # Needs nuke, which standalone sessions don't have.
+    import readBuilder
+    table = self.myTable.model()
+    feeds = table.sourceModel()
+    reads = []
+    for idx in sorted(self.myTable.selectionModel().selectedRows(1), key = lambda idx: idx.row()):
+      feed = feeds.feed(table.mapToSource(idx).row())
+      paths = self.xml_model.document.feed_paths(feed)
+      if paths:
+        reads.append((paths, table.data(idx, QtCore.Qt.DisplayRole)))
+    readBuilder.createReadNodes(reads, READ_CONTACT_SHEET)
 
 class TwoWayDict(dict):
     def __setitem__(self, key, value):
@@ -281,9 +465,67 @@ class TwoWayDict(dict):
         """Returns the number of connections"""
         return dict.__len__(self) // 2
 
+# Groups sorted rows into (first, last) runs of consecutive rows.
+def contiguousRuns(rows):
+  runs = []
+  for row in rows:
+    if runs and runs[-1][1] == row - 1:
+      runs[-1][1] = row
+    else:
+      runs.append([row, row])
+  return [tuple(run) for run in runs]
+
+# Typed key of a feeds table value : dates as timestamps, paths by name
+# then frame range, text as is. Keys of a column all have the same type,
+# values that don't parse sort after the others.
+def sortKey(column, value):
+  if value is None:
+    value = ""
+  if column == 4:
+    timestamp = parseDate(value)
+    return (timestamp is None, timestamp or 0.0, value)
+  if column == 6:
+    path, first, last = splitFrameRange(value)
+    return (path, first is None, first or 0, last or 0)
+  return value
+
 class OpenClipFeedsProxyModel(MyIdentityProxyModel):
+  # Emitted from the resolver's worker threads, delivered on the GUI thread.
+  ownersResolved = QtCore.Signal(object)
+  # Same for the verifier's.
+  statusesVerified = QtCore.Signal(object)
+
+  # Where the columns find their values, below the feed of a row or below
+  # its version, in the order mapToSource tries them. mapFromSource reads
+  # them back through FEED_CELLS and VERSION_CELLS.
+  CELL_PATHS = {
+    1: ('version', ('name',)),
+    2: ('feed', ('userData/shotType',)),
+    3: ('feed', ('userData/user',)),
+    4: ('version', ('creationDate',)),
+    5: ('feed', ('comment',)),
+    6: ('feed', ('spans/span/path', 'spans/span/paths/path')),
+  }
+  # Attributes of the elements create_cell adds.
+  CREATED_ATTRIBUTES = { 'userData': { 'type': 'dict' }, 'shotType': { 'type': 'string' }, 'user': { 'type': 'string' } }
+  FEED_CELLS = dict((tuple(path.split('/')), column) for column, (owner, paths) in CELL_PATHS.items() if owner == 'feed' for path in paths)
+  VERSION_CELLS = dict((tuple(path.split('/')), column) for column, (owner, paths) in CELL_PATHS.items() if owner == 'version' for path in paths)
+
   def __init__(self, parent = None, *arg):
     QtGui.QAbstractProxyModel.__init__(self, parent, *arg)
+    self.owners = OwnerResolver(self.ownersResolved.emit)
+    self.ownersResolved.connect(self.updateOwners)
+    self.verifier = FrameVerifier()
+    self.statusesVerified.connect(self.updateStatuses)
+    # First frame path -> feed rows showing its owner.
+    self.owner_rows = {}
+    # Span path -> feed rows waiting for its verified status.
+    self.status_rows = {}
+    # Column -> displayed values by row, filled a whole column at a time
+    # straight from the XML. None entries are read again on next use.
+    self.columns = {}
+    # Column -> sort keys by row, built from the values above.
+    self.keys = {}
     self.cols = TwoWayDict()
     self.cols['ID'] = 0
     self.cols['Name'] = 1
@@ -292,96 +534,379 @@ class OpenClipFeedsProxyModel(MyIdentityProxyModel):
     self.cols['Date'] = 4
     self.cols['Comment'] = 5
     self.cols['Path'] = 6
+    self.cols['Status'] = 7
+
+  def setSourceModel(self, sourceModel):
+    MyIdentityProxyModel.setSourceModel(self, sourceModel)
+    sourceModel.trackChanged.connect(self.sourceTrackChanged)
+
+  # The feeds of another track are shown, every row changes.
+  def sourceTrackChanged(self, track):
+    self.beginResetModel()
+    self.sourceModelReset()
+
+  def is_feeds(self, sourceIndex):
+    if not sourceIndex.isValid() or sourceIndex.internalPointer().name != "feeds":
+      return False
+    return sourceIndex.internalPointer() is self.sourceModel().feeds_item()
 
   def sourceRowsAboutToBeInserted(self, parent, start, end):
-    if parent.internalPointer().name == "feeds":
+    if self.is_feeds(parent):
       self.beginInsertRows(self.mapFromSource(parent), start - 1, end - 1)
 
   def sourceRowsInserted(self, parent, start, end):
-    if parent.internalPointer().name == "feeds":
+    if self.is_feeds(parent):
+      self.move_waiting_rows(start - 1, end - start + 1)
+      for values in self.cached():
+        values[start - 1:start - 1] = [None] * (end - start + 1)
       self.endInsertRows()
+    elif parent.isValid():
+      self.forget_row(parent.internalPointer())
+
+  def sourceRowsAboutToBeRemoved(self, parent, start, end):
+    if self.is_feeds(parent):
+      self.beginRemoveRows(self.mapFromSource(parent), start - 1, end - 1)
+
+  def sourceRowsRemoved(self, parent, start, end):
+    if self.is_feeds(parent):
+      self.move_waiting_rows(start - 1, start - end - 1)
+      for values in self.cached():
+        del values[start - 1:end]
+      self.endRemoveRows()
+    elif parent.isValid():
+      self.forget_row(parent.internalPointer())
+
+  def sourceModelReset(self):
+    self.owner_rows = {}
+    self.status_rows = {}
+    self.columns = {}
+    self.keys = {}
+    self.endResetModel()
+
+  # Values map to their own cells, feeds (or their versions) replaced by a
+  # reload change whole rows. Changes to anything the table doesn't show
+  # are dropped.
+  def sourceDataChanged(self, topLeft, bottomRight):
+    if not topLeft.isValid():
+      return
+    root = QtCore.QModelIndex()
+    last = self.columnCount(root) - 1
+    parent = topLeft.parent()
+    if self.is_feeds(parent):
+      for row in range(topLeft.row() - 1, bottomRight.row()):
+        self.forget_cell(row)
+      self.dataChanged.emit(self.index(topLeft.row() - 1, 0, root), self.index(bottomRight.row() - 1, last, root))
+      return
+    for sourceRow in range(topLeft.row(), bottomRight.row() + 1):
+      item = self.sourceModel().index(sourceRow, 0, parent).internalPointer()
+      if item is None:
+        continue
+      if item.type == "tag" and item.name == "version" and item.parent.name == "versions":
+        feedIdx = self.sourceModel().version_feed_index(item._inner.get('uid'))
+        if feedIdx.isValid():
+          self.forget_cell(feedIdx.row() - 1)
+          self.dataChanged.emit(self.index(feedIdx.row() - 1, 0, root), self.index(feedIdx.row() - 1, last, root))
+      elif bottomRight.column() >= 1:
+        cell = self.source_cell(item)
+        if cell is not None:
+          self.forget_cell(*cell)
+          idx = self.index(cell[0], cell[1], root)
+          self.dataChanged.emit(idx, idx)
+
+  def cached(self):
+    return list(self.columns.values()) + list(self.keys.values())
+
+  # Drops the cached values of a row, or of one of its cells.
+  def forget_cell(self, row, column = None):
+    for cache in (self.columns, self.keys):
+      for col, values in cache.items():
+        if (column is None or col == column) and 0 <= row < len(values):
+          values[row] = None
+
+  # Drops the cached values of the row showing item, if any.
+  def forget_row(self, item):
+    position = self.source_position(item)
+    if position is not None and position[1] >= 0:
+      self.forget_cell(position[1])
+
+  # Keeps the rows showing an owner or waiting for a status in step with
+  # inserted (count > 0) or removed (count < 0) rows starting at first.
+  def move_waiting_rows(self, first, count):
+    for waiting in (self.owner_rows, self.status_rows):
+      for path, rows in list(waiting.items()):
+        rows = set(row + count if row >= first else row for row in rows if not first <= row < first - count)
+        if rows:
+          waiting[path] = rows
+        else:
+          del waiting[path]
 
+  @traced
   def rowCount(self, parent):
-    trackIdx = self.sourceModel().track_index()
-    feedsIdx = self.sourceModel().sub_idx("feeds", parent = trackIdx)
-    return len(feedsIdx.internalPointer()._inner.findall("./*"))
+    feeds = self.sourceModel().feeds_item()
+    return feeds.child_count() - 1 if feeds is not None else 0
 
   def columnCount(self, parent):
     return len(self.cols)
 
+  @traced
   def index(self, row, count, parent):
     return self.createIndex(row, count)
 
-  # This... is horrible. But it works ¯\_(ツ)_/¯
-  # The proper way to do this would be to use the "real" index fn
-  # and do the mappings here. I'm lazy though. This will sooooo
-  # come and bite me in the ass later.
   def mapFromSource(self, sourceIndex):
-    return QtCore.QModelIndex()
+    if not sourceIndex.isValid() or sourceIndex.column() != 1:
+      return QtCore.QModelIndex()
+    cell = self.source_cell(sourceIndex.internalPointer())
+    if cell is None:
+      return QtCore.QModelIndex()
+    return self.createIndex(cell[0], cell[1])
+
+  # (owner, row, tags) locating item below the feed or version of a row :
+  # owner is 'feed' or 'version', tags the path from there down to item.
+  # None when item is not below a row of the table.
+  def source_position(self, item):
+    path = []
+    while item.type == "tag" and item.parent is not None:
+      parent = item.parent
+      if item.name == "feed" and parent.name == "feeds":
+        if parent is not self.sourceModel().feeds_item():
+          return None
+        return 'feed', item.row - 1, tuple(reversed(path))
+      if item.name == "version" and parent.name == "versions":
+        row = self.sourceModel().version_feed_index(item._inner.get('uid')).row()
+        return 'version', row - 1, tuple(reversed(path))
+      path.append(item.name)
+      item = parent
+    return None
+
+  # The (row, column) of the cell showing item, None if there is none.
+  def source_cell(self, item):
+    position = self.source_position(item)
+    if position is None:
+      return None
+    owner, row, path = position
+    column = (self.FEED_CELLS if owner == 'feed' else self.VERSION_CELLS).get(path)
+    if column is None or row < 0:
+      return None
+    # mapToSource always picks the first child of a tag.
+    for tag in path:
+      if item.parent.child_row(item.name) != item.row:
+        return None
+      item = item.parent
+    return row, column
 
+  # The index of the element showing a cell, invalid when there is none :
+  # reads show a default for those (see default), only setData creates
+  # them.
+  @traced
   def mapToSource(self, proxyIndex):
-    if not proxyIndex.isValid():
-      return QtCore.QModelIndex()
-    tracksIdx = self.sourceModel().sub_idx("tracks")
-    trackIdx = self.sourceModel().sub_idx("track", parent = tracksIdx)
-    feedsIdx = self.sourceModel().sub_idx("feeds", parent = trackIdx)
-    feedIdx = self.sourceModel().index(proxyIndex.row() + 1, 0, feedsIdx)
-    xml = self.sourceModel().root._inner
-    if proxyIndex.column() == 0: 
-      # Overriding data to add this column, since it does not exist in the
-      # original model.
+    if not proxyIndex.isValid() or proxyIndex.column() not in self.CELL_PATHS:
       return QtCore.QModelIndex()
-    elif proxyIndex.column() == 1:
-      vuid = feedIdx.internalPointer()._inner.attrib['vuid']
-      versions = self.sourceModel().sub_idx("versions")
-      versionIdx = self.sourceModel().sub_idx("version[@uid='%s']" % vuid, parent = versions)
-      version = versionIdx.internalPointer()._inner
-      return self.sourceModel().sub_idx("name", parent = versionIdx, col = 1, value = version.attrib['uid'])
-    elif proxyIndex.column() == 2:
-      userDataIdx = self.sourceModel().sub_idx("userData", parent = feedIdx, dict = { 'type': 'dict' })
-      return self.sourceModel().sub_idx("shotType", parent = userDataIdx, col = 1, dict = { 'type': 'string' }, value = DEFAULT_TYPE)
-    elif proxyIndex.column() == 3:
-      #return self.parent().getUser(proxyIndex)
-      userDataIdx = self.sourceModel().sub_idx("userData", parent = feedIdx, dict = { 'type': 'dict' })
+    owner, paths = self.CELL_PATHS[proxyIndex.column()]
+    ownerIdx = self.row_index(proxyIndex.row(), owner)
+    for path in paths:
+      idx = self.sourceModel().find_index(ownerIdx, path, 1)
+      if idx.isValid():
+        return idx
+    return QtCore.QModelIndex()
+
+  # The source index of the feed of a row, or of its version.
+  def row_index(self, row, owner = 'feed'):
+    feedIdx = self.sourceModel().index(row + 1, 0, self.sourceModel().feeds_index())
+    if owner == 'feed' or not feedIdx.isValid():
+      return feedIdx
+    return self.sourceModel().version_index(feedIdx.internalPointer()._inner.get('vuid'))
+
+  @traced
+  def setData(self, index, value, role):
+    if not index.isValid() or index.column() not in self.CELL_PATHS:
+      return False
+    sourceIndex = self.mapToSource(index)
+    if not sourceIndex.isValid():
+      sourceIndex = self.create_cell(index.row(), index.column())
+    return sourceIndex.isValid() and self.sourceModel().setData(sourceIndex, value, role)
+
+  # Creates the missing elements on the way to a cell.
+  def create_cell(self, row, column):
+    owner, paths = self.CELL_PATHS[column]
+    idx = self.row_index(row, owner)
+    tags = paths[0].split('/')
+    for i, tag in enumerate(tags):
+      if not idx.isValid():
+        break
+      col = 1 if i == len(tags) - 1 else 0
+      found = self.sourceModel().find_index(idx, tag, col)
+      idx = found if found.isValid() else self.sourceModel().create_idx(tag, parent = idx, col = col, dict = self.CREATED_ATTRIBUTES.get(tag, {}))
+    return idx
+
+  # Cells are the same whether their element exists or not.
+  def flags(self, index):
+    if not index.isValid():
+      return QtCore.Qt.NoItemFlags
+    return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled
+
+  # The feed element of a row.
+  def feed(self, row):
+    return self.sourceModel().feeds_item().children()[row]
+
+  # The first frame of a feed, whose owner is its user.
+  def owner_path(self, feed):
+    path = self.sourceModel().document.feed_path(feed)
+    parsed = parseFramePath(path)
+    return parsed.frame(parsed.first) if parsed is not None and parsed.ranges else path
+
+  def owner(self, feed, row):
+    try:
+      path = self.owner_path(feed)
+    except Exception as e:
+      debug(e)
+      return UNKNOWN_OWNER
+    # Kept to repaint the row when the owner comes, or changes.
+    self.owner_rows.setdefault(path, set()).add(row)
+    text = self.owners.cached(path)
+    return text if text is not None else self.owners.owner(path)
+
+  @QtCore.Slot(object)
+  @traced
+  def updateOwners(self, results):
+    for path, owner in results:
+      for row in sorted(self.owner_rows.get(path, ())):
+        self.forget_cell(row, 3)
+        idx = self.index(row, 3, QtCore.QModelIndex())
+        self.dataChanged.emit(idx, idx)
+
+  # Checks the frames of the feeds of the track on disk, in the background.
+  # The Status column fills in as directories are done.
+  def verify(self):
+    document = self.sourceModel().document
+    self.status_rows = {}
+    feeds = self.sourceModel().feeds_item()
+    for row, feed in enumerate(feeds.children() if feeds is not None else []):
+      for path in document.feed_paths(feed):
+        self.status_rows.setdefault(path, set()).add(row)
+    paths = list(self.status_rows.keys())
+    def run():
       try:
-        formattedPath = feedIdx.internalPointer()._inner.find(".//path").text
-        path, padding, startFrame, endFrame = getFramePath(formattedPath)
-        stat = os.stat(path.format(f = str(startFrame)))
-        text = pwd.getpwuid(stat.st_uid).pw_name
+        self.verifier.verify(paths, self.statusesVerified.emit)
       except Exception as e:
-        debug(e)
-        text = "unknown"
-      return self.sourceModel().sub_idx("user", parent = userDataIdx, col = 1, dict = { 'type': 'string' }, value = text)
-    elif proxyIndex.column() == 4:
-      vuid = feedIdx.internalPointer()._inner.attrib['vuid']
-      versions = self.sourceModel().sub_idx("versions")
-      version = self.sourceModel().sub_idx("version[@uid='%s']" % vuid, parent = versions)
-      return self.sourceModel().sub_idx("creationDate", parent = version, col = 1)
-    elif proxyIndex.column() == 5:
-      try:
-        return self.sourceModel().sub_idx("comment", parent = feedIdx, col = 1)
-      except:
-        feed = feedIdx.internalPointer()._inner
-        index = len(feed.findall("./*")) + 1
-        self.sourceModel().beginInsertRows(feedIdx, index, index)
-        ET.SubElement(feed, "comment")
-        self.sourceModel().endInsertRows()
-        return QtCore.QModelIndex()
-    elif proxyIndex.column() == 6:
-      spansIdx = self.sourceModel().sub_idx("spans", parent = feedIdx)
-      spanIdx = self.sourceModel().sub_idx("span", parent = spansIdx)
-      if spanIdx.internalPointer()._inner.find("path") is None:
-        pathsIdx = self.sourceModel().sub_idx("paths", parent = spanIdx)
-        return self.sourceModel().sub_idx("path", parent = pathsIdx, col = 1)
+        warning("Frame verification failed : %s", e)
+    thread = threading.Thread(target = run)
+    thread.daemon = True
+    thread.start()
+
+  # The verified status of a feed, "" until all its spans are checked.
+  def status(self, feed):
+    statuses = [self.verifier.cached(path) for path in self.sourceModel().document.feed_paths(feed)]
+    if not statuses or None in statuses:
+      return ""
+    return mergeStatuses(statuses).text()
+
+  # Updates the rows of the verified spans, a signal per run of rows.
+  @QtCore.Slot(object)
+  @traced
+  def updateStatuses(self, statuses):
+    rows = set()
+    for status in statuses:
+      rows.update(self.status_rows.pop(status.path, ()))
+    runs = []
+    for row in sorted(rows):
+      self.forget_cell(row, 7)
+      if runs and runs[-1][1] == row - 1:
+        runs[-1][1] = row
       else:
-        return self.sourceModel().sub_idx("path", parent = spanIdx, col = 1)
-    else:
-      return QtCore.QModelIndex()
+        runs.append([row, row])
+    for first, last in runs:
+      self.dataChanged.emit(self.index(first, 7, QtCore.QModelIndex()), self.index(last, 7, QtCore.QModelIndex()))
 
+  @traced
   def data(self, index, role):
-    if index.isValid() and index.column() == 0 and (role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole):
+    if index.isValid() and role == SORT_ROLE:
+      return self.sort_key(index.row(), index.column())
+    # The source model has nothing but text, views asking for fonts or
+    # colours don't need to be mapped.
+    if not index.isValid() or (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.EditRole):
+      return None
+    if index.column() == 0:
       return index.row()
-    return MyIdentityProxyModel.data(self, index, role)
+    return self.cell(index.row(), index.column())
+
+  @traced
+  def sort_key(self, row, column):
+    if column == 0:
+      return row
+    keys = self.keys.get(column, None)
+    if keys is not None and keys[row] is not None:
+      return keys[row]
+    value = self.cell(row, column)
+    values = self.columns[column]
+    if keys is None:
+      keys = self.keys[column] = [None] * len(values)
+    key = sortKey(column, value)
+    # Placeholders aren't cached, nor are their keys.
+    if values[row] is not None:
+      keys[row] = key
+    return key
+
+  # The cached value of a cell. Values missing from the XML are defaults,
+  # see default.
+  @traced
+  def cell(self, row, column):
+    values = self.columns.get(column, None)
+    if values is None:
+      feeds = self.sourceModel().feeds_item()
+      values = self.columns[column] = [self.xml_value(feed, column) for feed in feeds.children()]
+    value = values[row]
+    if value is None:
+      feed = self.feed(row)
+      value = self.xml_value(feed, column)
+      if value is None:
+        value = self.default(feed, row, column)
+      values[row] = value
+      if value is None:
+        return OWNER_PLACEHOLDER if column == 3 else None
+    return value
+
+  # What the cell of a feed shows when its element is missing, and the
+  # Status column. None while the owner of the feed is being resolved.
+  def default(self, feed, row, column):
+    if column == 1:
+      version = self.sourceModel().document.feed_version(feed)
+      return version.get('uid') if version is not None else None
+    elif column == 2:
+      return DEFAULT_TYPE
+    elif column == 3:
+      return self.owner(feed, row)
+    elif column == 7:
+      return self.status(feed)
+    return ""
+
+  # Feed uid -> owner of the feeds of every track whose owner is known,
+  # for normalize.
+  def known_owners(self):
+    document = self.sourceModel().document
+    owners = {}
+    for track in document.tracks():
+      for feed in track.findall("feeds/feed"):
+        try:
+          owner = self.owners.cached(self.owner_path(feed))
+        except Exception:
+          owner = None
+        if owner is not None:
+          owners[feed.get('uid')] = owner
+    return owners
+
+  # The text of a cell read from the XML without touching the model, None
+  # when its element doesn't exist.
+  def xml_value(self, feed, column):
+    if column not in self.CELL_PATHS:
+      return None
+    document = self.sourceModel().document
+    owner, paths = self.CELL_PATHS[column]
+    elem = feed if owner == 'feed' else document.feed_version(feed)
+    for path in paths:
+      found = elem.find(path)
+      if found is not None:
+        return found.text if found.text is not None else ""
+    return None
 
   def headerData(self, section, orientation, role):
     if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
@@ -397,16 +922,26 @@ class OpenClipVersionProxyModel(MyIdentityProxyModel):
 
   def sourceRowsAboutToBeInserted(self, parent, start, end):
     if parent.internalPointer().name == "versions":
-      debug("sourceRowsAboutToBeInserted : %d,%d" % (start - 1, end - 1))
+      trace("sourceRowsAboutToBeInserted : %d,%d", start - 1, end - 1)
       self.beginInsertRows(self.mapFromSource(parent), start - 1, end - 1)
 
   def sourceRowsInserted(self, parent, start, end):
     if parent.internalPointer().name == "versions":
       self.endInsertRows()
+
+  def sourceRowsAboutToBeRemoved(self, parent, start, end):
+    if parent.internalPointer().name == "versions":
+      self.beginRemoveRows(self.mapFromSource(parent), start - 1, end - 1)
+
+  def sourceRowsRemoved(self, parent, start, end):
+    if parent.internalPointer().name == "versions":
+      self.endRemoveRows()
   
+  @traced
   def rowCount(self, parent):
     return self.sourceModel().rowCount(self.sourceModel().sub_idx("versions")) - 1
 
+  @traced
   def index(self, row, column, parent):
     assert parent.model() == self if parent.isValid() else True
     if not parent.isValid():
@@ -420,6 +955,7 @@ class OpenClipVersionProxyModel(MyIdentityProxyModel):
   def columnCount(self, parent):
     return 2
  
+  @traced
   def mapFromSource(self, sourceIndex):
     if not sourceIndex.isValid():
       return QtCore.QModelIndex()
@@ -427,38 +963,64 @@ class OpenClipVersionProxyModel(MyIdentityProxyModel):
       return QtCore.QModelIndex()
     return self.createIndex(sourceIndex.row() - 1, sourceIndex.column(), sourceIndex.internalPointer())
 
+  def version_index(self, row):
+    return self.sourceModel().index(row + 1, 0, self.sourceModel().sub_idx("versions"))
+
+  # The name of a version, invalid when it has none : it shows its uid
+  # then, and setData creates it.
+  @traced
   def mapToSource(self, proxyIndex):
     if not proxyIndex.isValid():
       return QtCore.QModelIndex()
-      #return self.sourceModel().sub_idx("versions")
-    versionsIdx = self.sourceModel().sub_idx("versions")
-    versionIdx = self.sourceModel().index(proxyIndex.row() + 1, 0, versionsIdx)
-    if versionIdx.internalPointer()._inner.find("name") is None:
-      self.sourceModel().beginInsertRows(versionIdx, self.sourceModel().rowCount(versionIdx), self.sourceModel().rowCount(versionIdx))
-      name = ET.SubElement(versionIdx.internalPointer()._inner, "name")
-      name.text = versionIdx.internalPointer()._inner.attrib['uid']
-      self.sourceModel().endInsertRows()
-      return QtCore.QModelIndex()
-    else:
-      return self.sourceModel().sub_idx("name", versionIdx, 1)
-      
-    return self.sourceModel().sub_idx("name", versionIdx, 1)
+    return self.sourceModel().find_index(self.version_index(proxyIndex.row()), "name", 1)
+
+  @traced
+  def setData(self, index, value, role):
+    if not index.isValid() or index.column() != 1:
+      return False
+    sourceIndex = self.mapToSource(index)
+    if not sourceIndex.isValid():
+      sourceIndex = self.sourceModel().create_idx("name", self.version_index(index.row()), 1)
+    return self.sourceModel().setData(sourceIndex, value, role)
 
+  def flags(self, index):
+    if not index.isValid():
+      return QtCore.Qt.NoItemFlags
+    return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled
+
+  @traced
   def data(self, index, role):
-    if index.isValid() and index.column() == 0 and (role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole):
+    if index.isValid() and index.column() == 0 and (role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole or role == SORT_ROLE):
       return index.row()
-    debug("data : %s[%d,%d]" % (index.internalPointer(), index.row(), index.column()))
-    return debug(MyIdentityProxyModel.data(self, index, role))
+    trace("data : %s[%d,%d]", index.internalPointer(), index.row(), index.column())
+    if not index.isValid() or (role != QtCore.Qt.DisplayRole and role != QtCore.Qt.EditRole and role != SORT_ROLE):
+      return None
+    sourceIndex = self.mapToSource(index)
+    if sourceIndex.isValid():
+      value = self.sourceModel().data(sourceIndex, QtCore.Qt.DisplayRole)
+    else:
+      value = self.version_index(index.row()).internalPointer()._inner.get('uid')
+    return value if value is not None or role != SORT_ROLE else ""
   def parent(self, child):
     return QtCore.QModelIndex()
  
 
 class OpenClipModelItem(object): 
+  # There is one item per row the views ever asked for, keep them small.
+  __slots__ = ('row', 'type', 'parent', '_inner', 'child_cache', '_children', '_rows', '_tags')
+
   def __init__(self, row, type, parent):
     self.row = row
     self.type = type
     self.parent = parent
-    self.child_cache = []
+    # Items of the children by row, sized to child_count() on first use.
+    self.child_cache = None
+    # Child index of a tag item, built on first use : the ordered child
+    # elements, then only when looked up, the rows they live at keyed by
+    # element and by tag.
+    self._children = None
+    self._rows = None
+    self._tags = None
 
   @property
   def name(self):
@@ -467,7 +1029,7 @@ class OpenClipModelItem(object):
     elif self.type == "attribute_list":
       return "#attr"
     elif self.type == "attribute_item":
-      return self._inner['name']
+      return self._inner
     else:
       return None
 
@@ -478,7 +1040,7 @@ class OpenClipModelItem(object):
     elif self.type == "attribute_list":
       return ""
     elif self.type == "attribute_item":
-      return self._inner['dict'][self._inner['name']]
+      return self.parent._inner[self._inner]
     else:
       return None
 
@@ -487,7 +1049,7 @@ class OpenClipModelItem(object):
     if self.type == "tag":
       self._inner.text = value
     elif self.type == "attribute_item":
-      self._inner['dict'][self._inner['name']] = value
+      self.parent._inner[self._inner] = value
     else:
       pass
 
@@ -503,29 +1065,110 @@ class OpenClipModelItem(object):
     item._inner = items
     return item
 
+  # Attribute items only hold their name, parent holds the attributes.
   @staticmethod
-  def attr_item((name, value), row, parent):
+  def attr_item(name, row, parent):
     item = OpenClipModelItem(row, "attribute_item", parent)
-    item._inner = { "dict": parent._inner, "name": name }
+    item._inner = name
     return item
 
+  def children(self):
+    if self._children is None:
+      self._children = self._inner.findall("./*")
+    return self._children
+
+  def _index(self):
+    if self._rows is None:
+      self._rows = {}
+      self._tags = {}
+      for i, elem in enumerate(self.children()):
+        self._rows[elem] = i + 1
+        self._tags.setdefault(elem.tag, []).append(i + 1)
+
+  # Must be called whenever an element is appended to self._inner, so the
+  # child index stays in sync with the tree.
+  def appended(self, elem):
+    # Children read after the append already have it, last.
+    if self._children is None or (self._children and self._children[-1] is elem):
+      return
+    self._children.append(elem)
+    if self._rows is not None:
+      self._rows[elem] = len(self._children)
+      self._tags.setdefault(elem.tag, []).append(len(self._children))
+
+  # Must be called after the elements at rows first..last were removed from
+  # self._inner, or elems were inserted at row.
+  def removed(self, first, last):
+    if self._children is not None:
+      del self._children[first - 1:last]
+    if self.child_cache is not None:
+      del self.child_cache[first:last + 1]
+    self._reindex()
+
+  def inserted(self, row, elems):
+    if self._children is not None:
+      self._children[row - 1:row - 1] = elems
+    if self.child_cache is not None and row < len(self.child_cache):
+      self.child_cache[row:row] = [None] * len(elems)
+    self._reindex()
+
+  def _reindex(self):
+    self._rows = None
+    self._tags = None
+    for row, item in enumerate(self.child_cache or ()):
+      if item is not None:
+        item.row = row
+
+  def row_of(self, elem):
+    self._index()
+    return self._rows.get(elem, None)
+
+  def child_rows(self, tag):
+    self._index()
+    return self._tags.get(tag, [])
+
+  @traced
+  def child_row(self, tag, attrib = {}):
+    self._index()
+    children = self._children
+    for row in self._tags.get(tag, ()):
+      elem = children[row - 1]
+      if all(elem.get(k) == v for k, v in attrib.items()):
+        return row
+    return None
+
+  @traced
   def child(self, row):
-    if row >= len(self.child_cache):
-      self.child_cache.extend([None] * (row + 1 + len(self.child_cache)))
-    if self.child_cache[row] is None:
+    cache = self.child_cache
+    if cache is None or row >= len(cache):
+      count = self.child_count()
+      if row >= count:
+        return None
+      if cache is None:
+        cache = self.child_cache = [None] * count
+      else:
+        cache.extend([None] * (count - len(cache)))
+    if cache[row] is None:
       if self.type == "tag" and row == 0:
-        self.child_cache[row] = self.attr_root(self._inner.attrib, self)
-      elif self.type == "tag" and row - 1 < len(self._inner.findall("./*")):
-        self.child_cache[row] = self.tag(self._inner.findall("./*")[row - 1], row, self)
-      elif self.type == "attribute_list" and row < len(self._inner.items()):
-        self.child_cache[row] = self.attr_item(self._inner.items()[row], row, self)
+        cache[row] = self.attr_root(self._inner.attrib, self)
+      elif self.type == "tag":
+        cache[row] = self.tag(self.children()[row - 1], row, self)
       else:
-        return None
-    return self.child_cache[row]
+        cache[row] = self.attr_item(list(self._inner.keys())[row], row, self)
+    return cache[row]
+
+  # Forgets the children, after the element's subtree (or its attributes)
+  # was replaced.
+  def reset(self):
+    self._children = None
+    self._rows = None
+    self._tags = None
+    if self.child_cache is not None:
+      del self.child_cache[1 if self.type == "tag" else 0:]
 
   def child_count(self):
     if self.type == "tag":
-      return len(self._inner.findall("./*")) + 1
+      return len(self.children()) + 1
     elif self.type == "attribute_list":
       return len(self._inner.items())
     else:
@@ -538,18 +1181,32 @@ class OpenClipModelItem(object):
     row = self.row if hasattr(self, 'row') else -500
     return "<%s type:%s, name:%s, value:%s, row:%d>" % ("OpenClipModelItem", type, name, value, row)
 
+# Qt adapter over a ClipDocument. The clip logic lives in the document,
+# this only maps it to rows and emits the model signals around changes.
 class OpenClipModel(QtCore.QAbstractItemModel):
-  def __init__(self, xml, parent = None, *args):
+  # Emitted after every change made to the document through the model.
+  modified = QtCore.Signal()
+  # Emitted after set_track, with the new track.
+  trackChanged = QtCore.Signal(int)
+
+  def __init__(self, document, parent = None, *args):
     QtCore.QAbstractItemModel.__init__(self, parent, *args)
-    self._xml = xml
-    self.root = OpenClipModelItem.tag(self._xml.getroot(), 0, None)
+    self.document = document
+    self.root = OpenClipModelItem.tag(self.document.getroot(), 0, None)
     self.cols = TwoWayDict()
     self.cols['Name'] = 0
     self.cols['Value'] = 1
+    # Records the edits when set, see clipJournal.
+    self.journal = None
+    # The track the feeds proxy shows and addAsset adds to.
+    self.track = 0
+    # Track -> item of its feeds, see feeds_index.
+    self._feeds_items = {}
 
   def columnCount(self, parent):
     return len(self.cols)
 
+  @traced
   def rowCount(self, parent):
     if parent.column() > 0:
       return 0
@@ -559,6 +1216,7 @@ class OpenClipModel(QtCore.QAbstractItemModel):
       parentItem = parent.internalPointer()
     return parentItem.child_count()
 
+  @traced
   def data(self, index, role):
     if not index.isValid():
       return None
@@ -572,6 +1230,7 @@ class OpenClipModel(QtCore.QAbstractItemModel):
     else:
       return None
 
+  @traced
   def setData(self, index, value, role):
     if not index.isValid():
       return False
@@ -582,6 +1241,11 @@ class OpenClipModel(QtCore.QAbstractItemModel):
     else:
       return False
     self.dataChanged.emit(index, index)
+    if item.type == "tag":
+      self.record({ 'op': 'text', 'path': self.item_path(item), 'text': value })
+    elif item.type == "attribute_item":
+      self.record({ 'op': 'attr', 'path': self.item_path(item.parent.parent), 'name': item.name, 'value': value })
+    self.setModified()
     return True
 
   def flags(self, index):
@@ -594,6 +1258,7 @@ class OpenClipModel(QtCore.QAbstractItemModel):
       return self.cols.get(section, None)
     return None
 
+  @traced
   def index(self, row, column, parent):
     if not self.hasIndex(row, column, parent):
       return QtCore.QModelIndex()
@@ -607,6 +1272,7 @@ class OpenClipModel(QtCore.QAbstractItemModel):
     else:
       return QtCore.QModelIndex()
 
+  @traced
   def parent(self, child):
     if not child.isValid():
       return QtCore.QModelIndex()
@@ -617,138 +1283,520 @@ class OpenClipModel(QtCore.QAbstractItemModel):
       return QtCore.QModelIndex()
     return self.createIndex(parentItem.row, 0, parentItem)
 
-  def track_index(self):
-    tracks = self.root._inner.find("tracks")
-    row = self.root._inner.findall("./*").index(tracks) + 1
+  # Brings the model up to date with other, the same clip as changed on
+  # disk. Only the versions and feeds that differ are touched, with row
+  # level signals, so views keep their selection and scroll position.
+  @traced
+  def update_from(self, other):
+    changes = self.document.diff(other)
+    if changes is None:
+      self.beginResetModel()
+      self.document.replace(other)
+      self._reroot()
+      self.endResetModel()
+      return
+    for track, container, theirs, removed, changed, added in changes:
+      if track is None:
+        parentIdx = self.sub_idx("versions")
+      else:
+        trackIdx = self._element_index(self.sub_idx("tracks"), track, 0)
+        parentIdx = self._element_index(trackIdx, container, 0)
+      item = parentIdx.internalPointer()
+      self._update_attributes(parentIdx, theirs.attrib)
+      for first, last in reversed(contiguousRuns(sorted(item.row_of(elem) for elem in removed))):
+        self.removeRows(first, last - first + 1, parentIdx)
+      for mine, elem in changed:
+        self._replace_element(self._element_index(parentIdx, mine, 0), elem)
+      positions = [position for position, elem in added]
+      elems = dict(added)
+      for first, last in contiguousRuns(positions):
+        children = item.children()
+        at = list(container).index(children[first]) if first < len(children) else len(container)
+        run = [elems[position] for position in range(first, last + 1)]
+        self.beginInsertRows(parentIdx, first + 1, last + 1)
+        for i, elem in enumerate(run):
+          container.insert(at + i, elem)
+        item.inserted(first + 1, run)
+        self.endInsertRows()
+    self.document.forget()
+    self.document.signature = other.signature
+    self.document.dirty = False
+
+  def _reroot(self):
+    self.root = OpenClipModelItem.tag(self.document.getroot(), 0, None)
+    self._feeds_items = {}
+    self.track = min(self.track, max(0, len(self.document.tracks()) - 1))
+
+  # Removes count child elements of parent from row on, with a single
+  # signal. Callers mark the document modified when it is.
+  def removeRows(self, row, count, parent = QtCore.QModelIndex()):
+    item = parent.internalPointer() if parent.isValid() else self.root
+    if item.type != "tag" or count < 1 or row < 1 or row + count > item.child_count():
+      return False
+    self.beginRemoveRows(parent, row, row + count - 1)
+    for elem in item.children()[row - 1:row - 1 + count]:
+      item._inner.remove(elem)
+    self.document.forget()
+    item.removed(row, row + count - 1)
+    self.endRemoveRows()
+    return True
+
+  # Removes versions and their feeds, with a signal per run of contiguous
+  # rows, or a reset past MAX_REMOVE_RUNS. Returns how many versions went.
+  @traced
+  def remove_versions(self, uids):
+    uids = set(uids)
+    current = self.document.current_version()
+    containers = [(self.sub_idx("versions"), "version", "uid")]
+    tracksIdx = self.sub_idx("tracks")
+    for track in self.document.getroot().findall("tracks/track"):
+      feedsIdx = self._element_index(self._element_index(tracksIdx, track, 0), track.find("feeds"), 0)
+      if feedsIdx.isValid():
+        containers.append((feedsIdx, "feed", "vuid"))
+    removals = []
+    for parentIdx, tag, key in containers:
+      children = parentIdx.internalPointer().children()
+      rows = [row + 1 for row, elem in enumerate(children) if elem.tag == tag and elem.get(key) in uids]
+      removals.append((parentIdx, contiguousRuns(rows)))
+    count = sum(1 for elem in self.document.versions() if elem.get('uid') in uids)
+    if count == 0:
+      return 0
+    self.record({ 'op': 'remove_versions', 'uids': sorted(uids) })
+    if sum(len(runs) for parentIdx, runs in removals) > MAX_REMOVE_RUNS:
+      self.beginResetModel()
+      self.document.remove_versions(uids)
+      self._reroot()
+      self.endResetModel()
+    else:
+      for parentIdx, runs in removals:
+        for first, last in reversed(runs):
+          self.removeRows(first, last - first + 1, parentIdx)
+      if current in uids:
+        if self.document.versions():
+          self.change_version(0)
+        else:
+          self.set_current_uid('')
+    self.setModified()
+    return count
+
+  # Replaces the attributes and children of the element at idx by those of
+  # elem.
+  def _replace_element(self, idx, elem):
+    item = idx.internalPointer()
+    self._update_attributes(idx, elem.attrib)
+    count = len(item.children())
+    if count > 0:
+      self.beginRemoveRows(idx, 1, count)
+    for child in list(item._inner):
+      item._inner.remove(child)
+    item.reset()
+    if count > 0:
+      self.endRemoveRows()
+    item._inner.text = elem.text
+    count = len(elem.findall("./*"))
+    if count > 0:
+      self.beginInsertRows(idx, 1, count)
+    for child in list(elem):
+      item._inner.append(child)
+    self.document.forget()
+    item.reset()
+    if count > 0:
+      self.endInsertRows()
+    self.dataChanged.emit(idx, self.index(idx.row(), 1, idx.parent()))
+
+  def _update_attributes(self, idx, attrib):
+    attrIdx = self.index(0, 0, idx)
+    attrItem = attrIdx.internalPointer()
+    current = attrItem._inner
+    if list(current.keys()) == list(attrib.keys()):
+      if dict(current.items()) != dict(attrib.items()):
+        for k, v in attrib.items():
+          current[k] = v
+        self.dataChanged.emit(self.index(0, 0, attrIdx), self.index(len(current) - 1, 1, attrIdx))
+      return
+    if len(current) > 0:
+      self.beginRemoveRows(attrIdx, 0, len(current) - 1)
+      current.clear()
+      attrItem.reset()
+      self.endRemoveRows()
+    if len(attrib) > 0:
+      self.beginInsertRows(attrIdx, 0, len(attrib) - 1)
+      for k, v in attrib.items():
+        current[k] = v
+      attrItem.reset()
+      self.endInsertRows()
+
+  # Writes the defaults the views show for missing elements into the
+  # document, with a single reset. owners maps feed uids to the user to
+  # write for them. Returns the number of elements created.
+  @traced
+  def normalize(self, owners = {}):
+    self.beginResetModel()
+    count = self.document.normalize(DEFAULT_TYPE, owners)
+    self._reroot()
+    self.endResetModel()
+    if count > 0:
+      self.record({ 'op': 'normalize', 'shotType': DEFAULT_TYPE, 'users': owners })
+      self.setModified()
+    return count
+
+  def setModified(self):
+    self.document.dirty = True
+    self.modified.emit()
+
+  def record(self, *edits):
+    if self.journal is not None:
+      self.journal.record(*edits)
+
+  def record_append(self, item, elem):
+    self.record(*self.append_edits(item, [elem]))
+
+  def append_edits(self, item, elems):
+    path = self.item_path(item)
+    return [{ 'op': 'append', 'path': path, 'xml': ET.tostring(elem).decode('ascii') } for elem in elems]
+
+  # Indexes of item and its ancestors among their siblings, from the root.
+  def item_path(self, item):
+    path = []
+    while item.parent is not None:
+      path.append(item.row - 1)
+      item = item.parent
+    path.reverse()
+    return path
+
+  def track_count(self):
+    return len(self.document.tracks())
+
+  def track_names(self):
+    return [self.document.track_name(track) for track in self.document.tracks()]
+
+  @QtCore.Slot(int)
+  def set_track(self, track):
+    if track != self.track and 0 <= track < self.track_count():
+      self.track = track
+      self.trackChanged.emit(track)
+
+  @traced
+  def track_index(self, track = None):
+    track = self.track if track is None else track
+    row = self.root.child_row("tracks")
+    if row is None:
+      return QtCore.QModelIndex()
     idx = self.index(row, 0, QtCore.QModelIndex())
-    debug(tracks.findall("./*"))
-    row = tracks.findall("./*").index(tracks.find("track")) + 1
-    return self.index(row, 0, idx)
+    rows = idx.internalPointer().child_rows("track")
+    if track >= len(rows):
+      return QtCore.QModelIndex()
+    return self.index(rows[track], 0, idx)
+
+  # The feeds of a track, invalid when it has none (see create_feeds).
+  # Their item is kept per track, the feeds proxy asks for it for every
+  # cell.
+  @traced
+  def feeds_index(self, track = None, col = 0):
+    track = self.track if track is None else track
+    item = self._feeds_items.get(track, None)
+    # Items are replaced when their parent is reset.
+    if item is None or item.parent.parent.child(item.parent.row) is not item.parent or item.parent.child(item.row) is not item:
+      trackIdx = self.track_index(track)
+      feedsIdx = self.sub_idx("feeds", parent = trackIdx) if trackIdx.isValid() else QtCore.QModelIndex()
+      if not feedsIdx.isValid():
+        return QtCore.QModelIndex()
+      item = self._feeds_items[track] = feedsIdx.internalPointer()
+    return self.createIndex(item.row, col, item)
+
+  def feeds_item(self, track = None):
+    feedsIdx = self.feeds_index(track)
+    return feedsIdx.internalPointer() if feedsIdx.isValid() else None
+
+  # feeds_index, creating the feeds of the track when missing.
+  def create_feeds(self, track = None):
+    feedsIdx = self.feeds_index(track)
+    if feedsIdx.isValid():
+      return feedsIdx
+    trackIdx = self.track_index(track)
+    return self.create_idx("feeds", parent = trackIdx) if trackIdx.isValid() else QtCore.QModelIndex()
 
   def track_name_index(self, trackIdx):
     if not trackIdx.isValid():
       return QtCore.QModelIndex()
-    track = trackIdx.internalPointer()._inner
-    if track.find("name") is not None:
-      row = track.findall("./*").index(track.find("name")) + 1
+    row = trackIdx.internalPointer().child_row("name")
+    if row is not None:
       return self.index(row, 0, trackIdx)
     else:
       return QtCore.QModelIndex()
 
-  def sub_idx(self, childName, parent = QtCore.QModelIndex(), col = 0, dict = {}, value = None):
+  def _element_index(self, parentIdx, elem, col):
+    if elem is None or not parentIdx.isValid():
+      return QtCore.QModelIndex()
+    row = parentIdx.internalPointer().row_of(elem)
+    if row is None:
+      return QtCore.QModelIndex()
+    return self.index(row, col, parentIdx)
+
+  def version_index(self, uid, col = 0):
+    return self._element_index(self.sub_idx("versions"), self.document.version(uid), col)
+
+  def feed_index(self, uid, col = 0):
+    return self._element_index(self.feeds_index(), self.document.feed(uid), col)
+
+  # The feed of a version in the current track.
+  def version_feed_index(self, vuid, col = 0):
+    feedsIdx = self.feeds_index()
+    if not feedsIdx.isValid():
+      return QtCore.QModelIndex()
+    return self._element_index(feedsIdx, self.document.version_feed(vuid, feedsIdx.internalPointer().parent._inner), col)
+
+  def current_version_index(self, col = 0):
+    return self.version_index(self.document.current_version(), col)
+
+  # The index of the first element at path (tags separated by /) below
+  # parentIdx, invalid when there is none.
+  @traced
+  def find_index(self, parentIdx, path, col = 0):
+    idx = parentIdx
+    tags = path.split('/')
+    for i, tag in enumerate(tags):
+      if not idx.isValid():
+        break
+      row = idx.internalPointer().child_row(tag)
+      if row is None:
+        return QtCore.QModelIndex()
+      idx = self.index(row, col if i == len(tags) - 1 else 0, idx)
+    return idx
+
+  # The index of a child element, or of an attribute under "#attr".
+  # Invalid when there is none : reads never change the clip.
+  @traced
+  def sub_idx(self, childName, parent = QtCore.QModelIndex(), col = 0, dict = {}):
     ptr = parent.internalPointer() if parent.isValid() else self.root
     if ptr.type == "tag" and childName == "#attr":
       return self.index(0, col, parent)
     elif ptr.type == "tag":
-      childAt = childName
-      for k, v in dict.items():
-        childAt += "[@%s='%s']" % (k, v)
-      if ptr._inner.find(childAt) is None:
-        self.beginInsertRows(parent, len(ptr._inner.findall("./*")) + 1, len(ptr._inner.findall("./*")) + 1)
-        c = ET.SubElement(ptr._inner, childName)
-        for k, v in dict.items():
-          c.attrib[k] = v
-        c.text = value
-      return self.index(ptr._inner.findall("./*").index(ptr._inner.find(childAt)) + 1, col, parent)
+      row = ptr.child_row(childName, dict)
+      return self.index(row, col, parent) if row is not None else QtCore.QModelIndex()
     elif ptr.type == "attribute_list":
-      i = 0
-      for (k, v) in ptr._inner.items():
+      for i, k in enumerate(ptr._inner.keys()):
         if k == childName:
           return self.index(i, col, parent)
-        else:
-          i += 1
-      import traceback
-      debug("creating index in sub_idx : %s, %s, %s, %s, %s\n%s" % (childName, parent, i, col, dict, value, ''.join(traceback.format_stack())))
-      self.beginInsertRows(parent, len(ptr._inner), len(ptr._inner))
+    return QtCore.QModelIndex()
+
+  # sub_idx, creating the element (with the attributes in dict) or the
+  # attribute with value when missing. Only for edits.
+  @traced
+  def create_idx(self, childName, parent = QtCore.QModelIndex(), col = 0, dict = {}, value = None):
+    idx = self.sub_idx(childName, parent, col, dict)
+    if idx.isValid():
+      return idx
+    ptr = parent.internalPointer() if parent.isValid() else self.root
+    if ptr.type == "tag":
+      row = ptr.child_count()
+      self.beginInsertRows(parent, row, row)
+      c = ET.SubElement(ptr._inner, childName)
+      for k, v in dict.items():
+        c.attrib[k] = v
+      c.text = value
+      ptr.appended(c)
+      self.endInsertRows()
+      self.record_append(ptr, c)
+      self.setModified()
+      return self.index(row, col, parent)
+    elif ptr.type == "attribute_list":
+      row = len(ptr._inner)
+      self.beginInsertRows(parent, row, row)
       ptr._inner[childName] = value
       self.endInsertRows()
-      return self.index(i, col, parent)
-    else:
-      return QtCore.QModelIndex()
+      self.record({ 'op': 'attr', 'path': self.item_path(ptr.parent), 'name': childName, 'value': value })
+      self.setModified()
+      return self.index(row, col, parent)
+    return QtCore.QModelIndex()
 
-  def addAsset(self):
-    node = nuke.selectedNode()
-    if node.Class() != "Read":
-      return
-    track = self._xml.find("tracks/track")
-    vuid = str(uuid.uuid1())
-    pathValArr = node['file'].value().split('%')
-    if len(pathValArr) > 1:
-      i = 0
-      while pathValArr[1][i].isdigit():
-        i += 1
-      padLen = int(pathValArr[1][:i])
-      pathValArr[1] = '[' + str(node['origfirst'].value()).zfill(padLen) + '-' + str(node['origlast'].value()).zfill(padLen) + ']' + pathValArr[1][pathValArr[1].index('d') + 1:]
-    pathVal = ''.join(pathValArr)
-    versionNameArr = os.path.basename(pathVal).split(".")[:-1]
-    if len(versionNameArr) > 0 and isFormat(versionNameArr[-1]):
-      versionNameArr = versionNameArr[:-1]
+  # Adds the Read nodes selected in Nuke, with groups those inside the
+  # selected Groups and Backdrops too. Returns the feed rows they got.
+  @traced
+  def addAsset(self, groups = False):
+    return self.add_assets(readNodeAssets(readNodes(nuke.selectedNodes(), groups)))
+
+  # Adds a version and a feed per asset, with one insert for the versions
+  # and one for the feeds. Returns the feed rows.
+  @traced
+  def add_assets(self, assets):
+    if not assets:
+      return []
     versionsIdx = self.sub_idx("versions")
-    index = self.rowCount(versionsIdx)
-    self.beginInsertRows(versionsIdx, index, index)
-    createVersionTag(self._xml.find("versions"), vuid, ".".join(versionNameArr))
+    versionsItem = versionsIdx.internalPointer()
+    first = self.rowCount(versionsIdx)
+    self.beginInsertRows(versionsIdx, first, first + len(assets) - 1)
+    versions = [self.document.add_version(asset.name) for asset in assets]
+    for version in versions:
+      versionsItem.appended(version)
     self.endInsertRows()
-    feedsIdx = self.sub_idx("feeds", parent = self.track_index())
-    index = self.rowCount(feedsIdx)
-    self.beginInsertRows(feedsIdx, index, index)
-    feed = ET.SubElement(track.find("feeds"), "feed")
-    feed.attrib["type"] = "feed"
-    feed.attrib["vuid"] = vuid
-    feed.attrib["uid"] = str(uuid.uuid1())
-    spans = ET.SubElement(feed, "spans")
-    spans.attrib["type"] = "spans"
-    spans.attrib["version"] = "4"
-    span = ET.SubElement(spans, "span")
-    span.attrib["type"] = "span"
-    span.attrib["version"] = "4"
-    path = ET.SubElement(span, "path")
-    path.text = pathVal
+    feedsIdx = self.create_feeds()
+    feedsItem = feedsIdx.internalPointer()
+    first = self.rowCount(feedsIdx)
+    self.beginInsertRows(feedsIdx, first, first + len(assets) - 1)
+    feeds = [self.document.add_feed(version.attrib['uid'], asset.paths, track = feedsItem.parent._inner) for version, asset in zip(versions, assets)]
+    for feed in feeds:
+      feedsItem.appended(feed)
     self.endInsertRows()
-    return index - 1
+    self.record(*(self.append_edits(versionsItem, versions) + self.append_edits(feedsItem, feeds)))
+    self.setModified()
+    return list(range(first - 1, first - 1 + len(assets)))
 
   @QtCore.Slot(int)
+  @traced
   def change_version(self, idx):
-    trackIdx = self.track_index()
-    track = trackIdx.internalPointer()._inner
-    feedsIdx = self.sub_idx("feeds", parent = trackIdx)
-    fattrIdx = self.sub_idx("#attr", parent = feedsIdx)
-    fattr0 = self.sub_idx("currentVersion", parent = fattrIdx, col = 0)
-    fattr1 = self.sub_idx("currentVersion", parent = fattrIdx, col = 1)
     versionsIdx = self.sub_idx("versions")
-    versions = versionsIdx.internalPointer()._inner
-    if len(versions.findall("./*")) == 0:
+    versions = versionsIdx.internalPointer().children()
+    if len(versions) == 0:
       return
-    version = versions.findall("./*")[len(versions.findall("./*")) - 1 - idx]
+    self.set_current_uid(debug(versions[len(versions) - 1 - idx].attrib['uid']))
+
+  # Makes uid, '' for none, the current version of the clip and of every
+  # track.
+  def set_current_uid(self, uid):
+    versionsIdx = self.sub_idx("versions")
+    changed = []
+    for track in range(self.track_count()):
+      fattrIdx = self.sub_idx("#attr", parent = self.create_feeds(track))
+      changed.append((self.create_idx("currentVersion", parent = fattrIdx, col = 0, value = uid), self.sub_idx("currentVersion", parent = fattrIdx, col = 1)))
     vattrIdx = self.sub_idx("#attr", parent = versionsIdx)
-    vattr0 = self.sub_idx("currentVersion", parent = vattrIdx, col = 0)
+    vattr0 = self.create_idx("currentVersion", parent = vattrIdx, col = 0, value = uid)
     vattr1 = self.sub_idx("currentVersion", parent = vattrIdx, col = 1)
-    fattr0.internalPointer().value = debug(version.attrib['uid'])
-    vattr0.internalPointer().value = version.attrib['uid']
+    self.document.set_current_version(uid)
     self.dataChanged.emit(vattr0, vattr1)
-    self.dataChanged.emit(fattr0, fattr1)
-
-def createVersionTag(versions, vuid, versionName):
-  version = ET.SubElement(versions, "version")
-  version.attrib["type"] = "version"
-  version.attrib["version"] = "3"
-  version.attrib["uid"] = vuid
-  nameTag = ET.SubElement(version, "name")
-  nameTag.text = versionName
-  creationDate = ET.SubElement(version, "creationDate")
-  creationDate.text = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-  comment = ET.SubElement(version, "comment")
-  comment.text = "AutoGenerated from nuke"
-  return version
-
-def isFormat(s):
-  try:
-    if s[0] == '%' and s[-1] == 'd':
-      x = int(s[1:-1])
-      return True
+    for attr0, attr1 in changed:
+      self.dataChanged.emit(attr0, attr1)
+    self.record({ 'op': 'current', 'uid': uid })
+    self.setModified()
+
+# Gathers the change signals a model emits during one turn of the event
+# loop and emits settled once, from the next turn, with the changed ranges
+# merged into one (topLeft, bottomRight) bounding range per parent. Rows
+# inserted or removed and resets make the ranges meaningless, they are
+# dropped and structural is set instead.
+class ChangeCoalescer(QtCore.QObject):
+  settled = QtCore.Signal(object, bool)
+
+  def __init__(self, model, parent = None):
+    QtCore.QObject.__init__(self, parent)
+    self.model = model
+    # parent key -> [parent, top, left, bottom, right]
+    self._ranges = {}
+    self._structural = False
+    self.timer = QtCore.QTimer(self)
+    self.timer.setSingleShot(True)
+    self.timer.setInterval(0)
+    self.timer.timeout.connect(self.flush)
+    model.dataChanged.connect(self.changed)
+    model.rowsInserted.connect(self.moved)
+    model.rowsRemoved.connect(self.moved)
+    model.modelReset.connect(self.moved)
+
+  @staticmethod
+  def key(parent):
+    if not parent.isValid():
+      return None
+    return (parent.row(), parent.column(), id(parent.internalPointer()))
+
+  def changed(self, topLeft, bottomRight):
+    if not self._structural:
+      parent = topLeft.parent()
+      key = self.key(parent)
+      bounds = self._ranges.get(key)
+      if bounds is None:
+        self._ranges[key] = [parent, topLeft.row(), topLeft.column(), bottomRight.row(), bottomRight.column()]
+      else:
+        bounds[1] = min(bounds[1], topLeft.row())
+        bounds[2] = min(bounds[2], topLeft.column())
+        bounds[3] = max(bounds[3], bottomRight.row())
+        bounds[4] = max(bounds[4], bottomRight.column())
+    self.timer.start()
+
+  def moved(self, *args):
+    self._structural = True
+    self._ranges = {}
+    self.timer.start()
+
+  # Changes made by the reactions to settled are gathered for the next turn.
+  @QtCore.Slot()
+  def flush(self):
+    self.timer.stop()
+    if not self._ranges and not self._structural:
+      return
+    ranges = [(self.model.index(top, left, parent), self.model.index(bottom, right, parent))
+              for parent, top, left, bottom, right in self._ranges.values()]
+    structural = self._structural
+    self._ranges = {}
+    self._structural = False
+    trace("settled %d ranges, structural %s", len(ranges), structural)
+    self.settled.emit(ranges, structural)
+
+# Saves the document on a worker thread, from a snapshot taken on the GUI
+# thread. Requests made while a save is running are coalesced into a
+# single save once it is done, and schedule() debounces autosaves.
+class ClipSaver(QtCore.QObject):
+  saved = QtCore.Signal(str, object)
+  _finished = QtCore.Signal(str, object, object)
+
+  def __init__(self, model, filename, delay = AUTOSAVE_DELAY, parent = None):
+    QtCore.QObject.__init__(self, parent)
+    self.model = model
+    self.filename = filename
+    self.timer = QtCore.QTimer(self)
+    self.timer.setSingleShot(True)
+    self.timer.setInterval(delay)
+    self.timer.timeout.connect(self.save)
+    self._finished.connect(self.finished)
+    self._thread = None
+    self._pending = False
+    # Journal position of the running save.
+    self._mark = 0
+
+  @QtCore.Slot()
+  def schedule(self):
+    self.timer.start()
+
+  @QtCore.Slot()
+  def save(self):
+    self.timer.stop()
+    if self._thread is not None:
+      self._pending = True
+      return
+    snapshot = self.model.document.snapshot()
+    self.model.document.dirty = False
+    if self.model.journal is not None:
+      self._mark = self.model.journal.mark()
+    self._thread = threading.Thread(target = self.run, args = (snapshot, self.filename))
+    self._thread.start()
+
+  def run(self, snapshot, filename):
+    try:
+      signature = snapshot.save(filename)
+      self._finished.emit(filename, signature, None)
+    except Exception as e:
+      self._finished.emit(filename, None, e)
+
+  @QtCore.Slot(str, object, object)
+  def finished(self, filename, signature, error):
+    self._thread = None
+    if error is not None:
+      warning("Couldn't save %s : %s", filename, error)
+      self.model.document.dirty = True
     else:
-      return False
-  except:
-    return False
+      self.model.document.signature = signature
+      if self.model.journal is not None:
+        self.model.journal.compact(signature[2], self._mark)
+    self.saved.emit(filename, error)
+    if self._pending:
+      self._pending = False
+      self.save()
+
+  def busy(self):
+    return self._thread is not None
+
+  def wait(self):
+    if self._thread is not None:
+      self._thread.join()
 
 def start():
   app = QtGui.QApplication([])
@@ -759,9 +1807,7 @@ def start():
 if __name__ == "__main__":
   start()
 
+# Kept for older menu.py files, see openClipPanel.
 def myinit():
-  try:
-    from nukescripts import panels
-    panels.registerWidgetAsPanel('__import__("add_clip").OpenClipWindow', 'Open Clip', 'im.cmc.OpenClipWindow')
-  except:
-    debug("Couldn't register panel")
+  import openClipPanel
+  openClipPanel.register()
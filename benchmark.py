@@ -0,0 +1,214 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+import uuid
+from xml.sax.saxutils import escape
+
+# Times the hot paths on synthetic clips and prints the results as JSON,
+# so runs can be compared over time :
+#
+#   python benchmark.py --versions 5000 --output before.json
+#
+# The Qt parts need PySide (QT_QPA_PLATFORM=offscreen is set for Qt
+# builds that support it) and are skipped without it. nuke is replaced
+# by nukeStub, which also keeps the debug output out of the results.
+
+USERS = ['alice', 'bob', u'j\xe9r\xf4me', 'render']
+SHOT_TYPES = ['comp', 'lighting', 'anim', 'source']
+# Rows a table view asks for to paint its first screen.
+VISIBLE_ROWS = 40
+
+# Writes a clip with versions versions and as many feeds, each feed having
+# userData (shot type and user) and a comment when asked for, and spans of
+# paths paths.
+def generateClip(filename, versions = 1000, userData = True, comments = True, paths = 1, seed = 0):
+  rand = random.Random(seed)
+  uids = [str(uuid.UUID(int = rand.getrandbits(128))) for i in range(versions)]
+  date = datetime.datetime(2015, 1, 1)
+  with open(filename, 'wb') as f:
+    def write(s):
+      f.write(s.encode('utf-8'))
+    current = uids[-1] if uids else ''
+    write(u'<?xml version="1.0"?>\n<clip type="clip" version="4">\n<tracks type="tracks">\n<track type="track" uid="%s">\n' % uuid.UUID(int = rand.getrandbits(128)))
+    write(u'<trackType>video</trackType>\n<name>benchmark</name>\n<feeds currentVersion="%s">\n' % current)
+    for i, vuid in enumerate(uids):
+      write(u'<feed type="feed" vuid="%s" uid="%s">\n<spans type="spans" version="4">\n<span type="span" version="4">' % (vuid, uuid.UUID(int = rand.getrandbits(128))))
+      spans = [u'/shows/bench/sq%02d/sh%04d/comp_v%03d.[1001-%d].exr' % (i % 50, i % 500, i, 1001 + rand.randint(10, 200) + j) for j in range(paths)]
+      if paths == 1:
+        write(u'<path>%s</path>' % spans[0])
+      else:
+        write(u'<paths>%s</paths>' % u''.join(u'<path>%s</path>' % path for path in spans))
+      write(u'</span>\n</spans>\n')
+      if userData:
+        write(u'<userData type="dict"><shotType type="string">%s</shotType><user type="string">%s</user></userData>\n' % (rand.choice(SHOT_TYPES), escape(rand.choice(USERS))))
+      if comments:
+        write(u'<comment>%s</comment>\n' % escape(u'take %d <%s> & notes' % (i, rand.choice(USERS))))
+      write(u'</feed>\n')
+    write(u'</feeds>\n</track>\n</tracks>\n<versions type="versions" currentVersion="%s">\n' % current)
+    for i, vuid in enumerate(uids):
+      date += datetime.timedelta(minutes = rand.randint(1, 600))
+      write(u'<version type="version" version="3" uid="%s"><name>comp_v%03d</name><creationDate>%s</creationDate></version>\n' % (vuid, i, date.strftime("%Y/%m/%d %H:%M:%S")))
+    write(u'</versions>\n</clip>\n')
+
+class Runner(object):
+  def __init__(self, repeat = 3):
+    self.repeat = repeat
+    self.results = {}
+
+  # Times run(setup()) repeat times, setup not being timed.
+  def measure(self, name, run, setup = None):
+    times = []
+    for i in range(self.repeat):
+      state = setup() if setup is not None else None
+      start = timeit.default_timer()
+      run(state)
+      times.append(timeit.default_timer() - start)
+    self.results[name] = { 'best': min(times), 'mean': sum(times) / len(times), 'runs': times }
+    sys.stderr.write("%-24s %8.4fs\n" % (name, min(times)))
+
+def documentBenchmarks(runner, clip, workdir):
+  from clipDocument import ClipDocument
+  runner.measure('load', lambda state: ClipDocument.load(clip))
+  saved = os.path.join(workdir, 'saved.clip')
+  runner.measure('save', lambda document: document.save(saved), lambda: ClipDocument.load(clip))
+  runner.measure('snapshot', lambda document: document.snapshot(), lambda: ClipDocument.load(clip))
+
+  import framePath
+  paths = [path.text for path in ClipDocument.load(clip).getroot().iter("path")]
+  def uncached():
+    framePath.clearCache()
+    return paths
+  runner.measure('parse_paths', framePath.parseFramePaths, uncached)
+  runner.measure('parse_paths_cached', framePath.parseFramePaths, lambda: paths)
+
+def qtBenchmarks(runner, clip, workdir):
+  try:
+    from PySide import QtCore, QtGui
+  except ImportError as e:
+    sys.stderr.write("Skipping the Qt benchmarks : %s\n" % e)
+    return False
+  import nukeStub
+  import add_clip
+  from clipDocument import ClipDocument
+  app = QtGui.QApplication.instance() or QtGui.QApplication([])
+
+  def setup():
+    nukeStub.reset()
+    model = add_clip.OpenClipModel(ClipDocument.load(clip))
+    feeds = add_clip.OpenClipFeedsProxyModel()
+    feeds.setSourceModel(model)
+    table = add_clip.SortProxyModel()
+    table.setSourceModel(feeds)
+    return model, feeds, table
+
+  def paint(state):
+    table = state[2]
+    root = QtCore.QModelIndex()
+    for row in range(min(VISIBLE_ROWS, table.rowCount(root))):
+      for col in range(table.columnCount(root)):
+        table.data(table.index(row, col, root), QtCore.Qt.DisplayRole)
+
+  def paintAll(state):
+    table = state[2]
+    root = QtCore.QModelIndex()
+    for row in range(table.rowCount(root)):
+      for col in range(table.columnCount(root)):
+        table.data(table.index(row, col, root), QtCore.Qt.DisplayRole)
+
+  runner.measure('first_paint', paint, setup)
+  runner.measure('full_paint', paintAll, setup)
+  columns = setup()[1].columnCount(QtCore.QModelIndex())
+  for col in range(columns):
+    runner.measure('sort_column_%d' % col, lambda state: state[2].sort(col), setup)
+
+  def switchVersions(state):
+    model = state[0]
+    for i in range(20):
+      model.change_version(i)
+  runner.measure('version_switch_x20', switchVersions, setup)
+
+  def addAssets(state):
+    model = state[0]
+    for i in range(20):
+      nukeStub.select(nukeStub.nodes.Read(file = '/shows/bench/new/plate_v%03d.%%04d.exr' % i, origfirst = 1001, origlast = 1100))
+      model.addAsset()
+  runner.measure('add_asset_x20', addAssets, setup)
+
+  def addAssetsBatch(state):
+    model = state[0]
+    nukeStub.select(*[nukeStub.nodes.Read(file = '/shows/bench/new/plate_v%03d.%%04d.exr' % i, origfirst = 1001, origlast = 1100) for i in range(20)])
+    model.addAsset()
+  runner.measure('add_asset_batch_20', addAssetsBatch, setup)
+
+  saved = os.path.join(workdir, 'saved.clip')
+  def save(state):
+    saver = add_clip.ClipSaver(state[0], saved)
+    saver.save()
+    saver.wait()
+    app.processEvents()
+  runner.measure('savexml', save, setup)
+  return True
+
+def parser():
+  parser = argparse.ArgumentParser(description = "Times the OpenClip hot paths on synthetic clips.")
+  parser.add_argument('--clip', help = "benchmark this clip instead of a generated one")
+  parser.add_argument('--versions', type = int, default = 2000, help = "versions (and feeds) of the generated clip")
+  parser.add_argument('--paths', type = int, default = 1, help = "paths per span of the generated clip")
+  parser.add_argument('--no-user-data', action = 'store_true', help = "generate feeds without userData")
+  parser.add_argument('--no-comments', action = 'store_true', help = "generate feeds without comments")
+  parser.add_argument('--seed', type = int, default = 0)
+  parser.add_argument('--repeat', type = int, default = 3)
+  parser.add_argument('--no-qt', action = 'store_true', help = "skip the Qt benchmarks")
+  parser.add_argument('--generate', metavar = 'FILE', help = "only write the generated clip to FILE")
+  parser.add_argument('-o', '--output', help = "write the JSON results to this file instead of stdout")
+  return parser
+
+def main(argv):
+  args = parser().parse_args(argv)
+  options = dict(versions = args.versions, userData = not args.no_user_data, comments = not args.no_comments, paths = args.paths, seed = args.seed)
+  if args.generate:
+    generateClip(args.generate, **options)
+    return 0
+  os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+  import nukeStub
+  nukeStub.install()
+  workdir = tempfile.mkdtemp(prefix = 'openclip-benchmark-')
+  try:
+    clip = args.clip
+    if clip is None:
+      clip = os.path.join(workdir, 'generated.clip')
+      generateClip(clip, **options)
+    size = os.path.getsize(clip)
+    runner = Runner(args.repeat)
+    documentBenchmarks(runner, clip, workdir)
+    qt = not args.no_qt and qtBenchmarks(runner, clip, workdir)
+  finally:
+    shutil.rmtree(workdir, ignore_errors = True)
+  from clipDocument import ET
+  report = {
+    'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    'python': platform.python_version(),
+    'xml': 'lxml' if hasattr(ET, 'LXML_VERSION') else 'etree',
+    'qt': qt,
+    'clip': args.clip or options,
+    'size': size,
+    'repeat': args.repeat,
+    'results': runner.results,
+  }
+  output = json.dumps(report, indent = 2, sort_keys = True)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(output + '\n')
+  else:
+    print(output)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
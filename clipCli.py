@@ -0,0 +1,199 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from clipDocument import ClipDocument, clipPath, versionName
+from framePath import parseFramePath
+from frameVerifier import FrameVerifier, mergeStatuses
+from sequenceScanner import frameFile, groupFiles, scan
+
+# Headless ingest, run through add_clip.py :
+#
+#   python add_clip.py -c shot.clip /plates/plate_v001.[1001-1100].exr
+#   python add_clip.py -c shot.clip /renders/comp_v003.%04d.exr:1001-1100
+#   python add_clip.py -c shot.clip -m manifest.txt --current
+#   python add_clip.py -c shot.clip -g '/renders/*/comp_v*.*.exr'
+#   python add_clip.py -c shot.clip -s /renders/shot010 -r
+#   python add_clip.py -c shot.clip --keep 5 --drop-offline
+#   python add_clip.py -c shot.clip --normalize
+#
+# Everything is added to the clip in one pass and saved once. It doesn't
+# need PySide nor Nuke.
+
+RANGE = re.compile(r'^(.*):(-?\d+)-(-?\d+)$')
+
+# A version to add, paths holding one path per span.
+class Asset(object):
+  def __init__(self, paths, name = None):
+    self.paths = [paths] if not isinstance(paths, list) else paths
+    self.name = name or versionName(self.paths[0])
+
+  @staticmethod
+  def sequence(sequence):
+    return Asset(sequence.span_paths())
+
+  def __repr__(self):
+    return "<Asset %s : %s>" % (self.name, ', '.join(self.paths))
+
+# Turns the path of a sequence, in any of the forms framePath reads, into
+# the absolute [first-last] form stored in clips. Paths without a range
+# need one.
+def spanPath(path, first = None, last = None):
+  path = os.path.abspath(path)
+  parsed = parseFramePath(path)
+  if parsed is None or parsed.ranges:
+    return path
+  if first is None or last is None:
+    raise ValueError("%s needs a frame range" % path)
+  return clipPath(path, first, last)
+
+# path, path:first-last, or a path followed by first and last.
+def parseAsset(words, name = None):
+  if len(words) == 3:
+    return Asset(spanPath(words[0], int(words[1]), int(words[2])), name)
+  match = RANGE.match(words[0])
+  if match is not None and len(words) == 1:
+    return Asset(spanPath(match.group(1), int(match.group(2)), int(match.group(3))), name)
+  if len(words) != 1:
+    raise ValueError("Can't read asset %s" % ' '.join(words))
+  return Asset(spanPath(words[0]), name)
+
+# Text manifests have one asset per line, as parseAsset reads them, and
+# ignore blank lines and # comments. JSON manifests are a list of paths or
+# of { "path", "first", "last", "name" } objects.
+def readManifest(filename):
+  with open(filename) as f:
+    if filename.endswith('.json'):
+      return [jsonAsset(entry) for entry in json.load(f)]
+    assets = []
+    for line in f:
+      line = line.strip()
+      if line and not line.startswith('#'):
+        assets.append(parseAsset(line.split()))
+    return assets
+
+def jsonAsset(entry):
+  if not isinstance(entry, dict):
+    return parseAsset([entry])
+  return Asset(spanPath(entry['path'], entry.get('first'), entry.get('last')), entry.get('name'))
+
+# Groups the frame files matched by pattern into sequences, other files
+# (movies...) are assets of their own. Sequences with holes get a span per
+# run of frames.
+def globAssets(pattern):
+  directories = {}
+  assets = []
+  for path in sorted(glob.glob(os.path.abspath(pattern))):
+    if os.path.isdir(path):
+      continue
+    directory, name = os.path.split(path)
+    if frameFile(name) is None:
+      assets.append(Asset(path))
+    else:
+      directories.setdefault(directory, []).append(name)
+  for directory, names in sorted(directories.items()):
+    assets.extend(Asset.sequence(sequence) for sequence in groupFiles(directory, names))
+  return assets
+
+# Adds a version and a feed for every asset not in the document yet.
+# Returns the added versions.
+def ingest(document, assets):
+  known = set(document.feed_path(feed) for feed in document.getroot().findall("tracks/track/feeds/feed"))
+  versions = []
+  for asset in assets:
+    if asset.paths[0] in known:
+      continue
+    known.add(asset.paths[0])
+    version = document.add_version(asset.name)
+    document.add_feed(version.attrib['uid'], asset.paths)
+    versions.append(version)
+  return versions
+
+# Prints the versions whose frames are missing, empty or can't be told.
+# Returns their number.
+def verifyFrames(document):
+  feeds = [(feed, document.feed_paths(feed)) for feed in document.getroot().findall("tracks/track/feeds/feed")]
+  statuses = FrameVerifier().verify([path for feed, paths in feeds for path in paths])
+  problems = 0
+  for feed, paths in feeds:
+    status = mergeStatuses([statuses[path] for path in paths])
+    if status.ok():
+      continue
+    problems += 1
+    version = document.feed_version(feed)
+    name = (version.findtext("name") if version is not None else None) or feed.get('vuid')
+    print("%s : %s" % (name, status.text(ranges = True)))
+  print("%d feeds verified, %d with missing or empty frames" % (len(feeds), problems))
+  return problems
+
+def parser():
+  parser = argparse.ArgumentParser(prog = 'add_clip.py', description = "Adds assets to an OpenClip file.")
+  parser.add_argument('paths', nargs = '*', help = "sequence paths : path.[1001-1100].exr, path.%%04d.exr:1001-1100 or path.####.exr:1001-1100")
+  parser.add_argument('-c', '--clip', help = "clip file to create or update")
+  parser.add_argument('-m', '--manifest', action = 'append', default = [], help = "file listing assets, one per line, or a JSON list")
+  parser.add_argument('-g', '--glob', action = 'append', default = [], help = "pattern matching frame files, grouped into sequences")
+  parser.add_argument('-s', '--scan', action = 'append', default = [], help = "directory whose sequences are added")
+  parser.add_argument('-r', '--recursive', action = 'store_true', help = "scan subdirectories too")
+  parser.add_argument('--current', action = 'store_true', help = "make the last added version the current one")
+  parser.add_argument('--keep', type = int, metavar = 'N', help = "remove all but the last N versions of each type")
+  parser.add_argument('--drop-offline', action = 'store_true', help = "remove the versions whose files are gone")
+  parser.add_argument('--normalize', action = 'store_true', help = "write the default names, types and comments the panel shows for missing ones")
+  parser.add_argument('--verify', action = 'store_true', help = "check that every frame of every feed is on disk, exiting with 1 when some aren't")
+  parser.add_argument('-n', '--dry-run', action = 'store_true', help = "only print what would be added")
+  return parser
+
+def main(argv, defaultClip = None, defaultType = 'source'):
+  args = parser().parse_args(argv)
+  clip = args.clip
+  if clip is None and defaultClip is not None:
+    try:
+      clip = defaultClip()
+    except Exception:
+      pass
+  if not clip:
+    sys.stderr.write("No clip file given\n")
+    return 2
+  try:
+    assets = [parseAsset([path]) for path in args.paths]
+    for manifest in args.manifest:
+      assets.extend(readManifest(manifest))
+    for pattern in args.glob:
+      assets.extend(globAssets(pattern))
+    if args.scan:
+      assets.extend(Asset.sequence(sequence) for sequence in scan(args.scan, recursive = args.recursive))
+  except (ValueError, KeyError, IOError, OSError) as e:
+    sys.stderr.write("%s\n" % e)
+    return 1
+  if os.path.exists(clip):
+    document = ClipDocument.load(clip)
+  else:
+    document = ClipDocument(filename = clip)
+  versions = ingest(document, assets)
+  for version in versions:
+    print("%s %s" % ("Would add" if args.dry_run else "Added", version.find("name").text))
+  if args.current and versions:
+    document.set_current_version(versions[-1].attrib['uid'])
+  uids = []
+  if args.keep is not None:
+    uids.extend(document.superseded_versions(args.keep))
+  if args.drop_offline:
+    uids.extend(document.offline_versions())
+  removed = document.remove_versions(uids) if uids else []
+  for version in removed:
+    print("%s %s" % ("Would remove" if args.dry_run else "Removed", version.find("name").text))
+  normalized = document.normalize(defaultType) if args.normalize else 0
+  if (versions or removed or normalized) and not args.dry_run:
+    document.save()
+  print("%d added, %d already in %s" % (len(versions), len(assets) - len(versions), clip))
+  if removed:
+    print("%d %s" % (len(removed), "would be removed" if args.dry_run else "removed"))
+  if normalized:
+    print("%d default values %s" % (normalized, "would be written" if args.dry_run else "written"))
+  if args.verify and verifyFrames(document):
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,600 @@
+import copy
+import datetime
+import hashlib
+import os
+import stat
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from debug import debug
+from framePath import parseFramePath
+from sequenceScanner import findSequence, parsePattern
+try:
+  import lxml.etree as ET
+  debug("Using lxml")
+except Exception as e:
+  from xml.etree import ElementTree as ET
+  debug("Using python xml : %s" % e)
+
+try:
+  basestring
+except NameError:
+  basestring = str
+
+# The umask of the process, None where it can't be read. Setting it to read
+# it would change it for every thread in the meantime.
+def processUmask():
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('Umask:'):
+          return int(line.split()[1], 8)
+  except (IOError, OSError, ValueError, IndexError):
+    pass
+  return None
+
+UMASK = processUmask()
+
+# Formats of creationDate, the first one is used for new versions. Flame
+# and older tools wrote the others.
+DATE_FORMATS = ['%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d %H:%M', '%a %b %d %H:%M:%S %Y']
+
+# Qt-free representation of an OpenClip file. Everything that reads or
+# changes the clip goes through here, the Qt models only wrap it. It can
+# be used on its own from scripts :
+#
+#   doc = ClipDocument.load("shot.clip")
+#   version = doc.add_version("plate_v002")
+#   doc.add_feed(version.attrib['uid'], "/plates/plate_v002.[1001-1100].exr")
+#   doc.set_current_version(version.attrib['uid'])
+#   doc.save()
+class ClipDocument(object):
+  def __init__(self, xml = None, filename = None):
+    self.filename = filename
+    self.xml = xml if xml is not None else self.skeleton()
+    self._versions = None
+    self._feeds = None
+    self._version_feeds = None
+    self._track_feeds = None
+    self.dirty = False
+    # (mtime, size, sha1) of the file as last read or written.
+    self.signature = None
+
+  @staticmethod
+  def skeleton():
+    root = ET.Element('clip')
+    root.attrib['type'] = 'clip'
+    root.attrib['version'] = '4'
+    tracks = ET.SubElement(root, 'tracks')
+    tracks.attrib['type'] = 'tracks'
+    versions = ET.SubElement(root, 'versions')
+    versions.attrib['type'] = 'versions'
+    track = ET.SubElement(tracks, 'track')
+    track.attrib['type'] = 'track'
+    track.attrib['uid'] = str(uuid.uuid1())
+    trackType = ET.SubElement(track, 'trackType')
+    trackType.text = 'video'
+    feeds = ET.SubElement(track, 'feeds')
+    return ET.ElementTree(root)
+
+  @classmethod
+  def load(cls, filename):
+    with open(filename, 'rb') as f:
+      source = HashingFile(f)
+      document = cls(ET.parse(source), filename)
+    document.signature = fileSignature(filename, source.hexdigest())
+    return document
+
+  def save(self, filename = None):
+    filename = filename or self.filename
+    debug(filename)
+    self.signature = atomicWrite(filename, self.write)
+    self.dirty = False
+
+  # Tells whether the file was changed by someone else since it was last
+  # read or written. mtime and size are checked first, the content is only
+  # hashed when they differ : network filesystems report changes (and touch
+  # files) that didn't change anything.
+  def changed_on_disk(self):
+    try:
+      st = os.stat(self.filename)
+    except OSError:
+      return False
+    if self.signature is None:
+      return True
+    mtime, size, digest = self.signature
+    if (st.st_mtime, st.st_size) == (mtime, size):
+      return False
+    try:
+      signature = fileSignature(self.filename, fileDigest(self.filename))
+    except (IOError, OSError):
+      return False
+    if signature[2] == digest:
+      self.signature = signature
+      return False
+    return True
+
+  def write(self, f):
+    writeTree(self.xml, f)
+
+  # Returns a copy of the document as it is now, that can be saved from
+  # another thread while this one keeps changing.
+  def snapshot(self):
+    return ClipSnapshot(copyTree(self.xml))
+
+  # Drops the uid index, after a subtree left the document or was moved
+  # into it.
+  def forget(self):
+    self._versions = None
+
+  # Becomes other, for changes diff() can't describe.
+  def replace(self, other):
+    self.xml = other.xml
+    self.signature = other.signature
+    self.dirty = other.dirty
+    self._versions = None
+
+  def getroot(self):
+    return self.xml.getroot()
+
+  def versions_element(self):
+    return self.getroot().find("versions")
+
+  def tracks(self):
+    return self.getroot().findall("tracks/track")
+
+  def track(self, index = 0):
+    tracks = self.tracks()
+    return tracks[index] if index < len(tracks) else None
+
+  # The name of a track, its type and number when it has none.
+  def track_name(self, track):
+    name = track.find("name")
+    if name is not None and name.text:
+      return name.text
+    trackType = track.find("trackType")
+    trackType = trackType.text if trackType is not None else None
+    return "%s %d" % (trackType or "track", self.tracks().index(track) + 1)
+
+  def feeds_element(self, track = None):
+    track = track if track is not None else self.track()
+    feeds = track.find("feeds")
+    if feeds is None:
+      feeds = ET.SubElement(track, "feeds")
+    return feeds
+
+  def versions(self):
+    return self.versions_element().findall("version")
+
+  def feeds(self, track = None):
+    return self.feeds_element(track).findall("feed")
+
+  def _uid_index(self):
+    if self._versions is None:
+      self._versions = {}
+      self._feeds = {}
+      self._version_feeds = {}
+      self._track_feeds = {}
+      for version in self.versions():
+        self._register(version)
+      for track in self.tracks():
+        for feed in track.findall("feeds/feed"):
+          self._register(feed, track)
+
+  # track is the track of feeds, when known.
+  def _register(self, elem, track = None):
+    if self._versions is None:
+      return
+    if elem.tag == "version" and 'uid' in elem.attrib:
+      self._versions[elem.attrib['uid']] = elem
+    elif elem.tag == "feed":
+      if 'uid' in elem.attrib:
+        self._feeds[elem.attrib['uid']] = elem
+      if 'vuid' in elem.attrib:
+        self._version_feeds.setdefault(elem.attrib['vuid'], elem)
+        if track is not None:
+          self._track_feeds.setdefault(track, {}).setdefault(elem.attrib['vuid'], elem)
+        else:
+          self._versions = None
+
+  def version(self, uid):
+    self._uid_index()
+    return self._versions.get(uid, None)
+
+  def feed(self, uid):
+    self._uid_index()
+    return self._feeds.get(uid, None)
+
+  # The feed of a version in track, in any track when None.
+  def version_feed(self, vuid, track = None):
+    self._uid_index()
+    if track is None:
+      return self._version_feeds.get(vuid, None)
+    return self._track_feeds.get(track, {}).get(vuid, None)
+
+  def feed_version(self, feed):
+    return self.version(feed.attrib.get('vuid', None))
+
+  def feed_path(self, feed):
+    path = feed.find(".//path")
+    return path.text if path is not None else None
+
+  # The paths of all the spans of a feed.
+  def feed_paths(self, feed):
+    return [path.text for path in feed.iter("path") if path.text]
+
+  def current_version(self):
+    return self.versions_element().attrib.get('currentVersion', None)
+
+  def add_version(self, name, uid = None):
+    version = createVersionTag(self.versions_element(), uid or str(uuid.uuid1()), name)
+    self._register(version)
+    self.dirty = True
+    return version
+
+  # path may be a list, for sequences with holes : one span per path.
+  def add_feed(self, vuid, path, uid = None, track = None):
+    track = track if track is not None else self.track()
+    feed = ET.SubElement(self.feeds_element(track), "feed")
+    feed.attrib["type"] = "feed"
+    feed.attrib["vuid"] = vuid
+    feed.attrib["uid"] = uid or str(uuid.uuid1())
+    spans = ET.SubElement(feed, "spans")
+    spans.attrib["type"] = "spans"
+    spans.attrib["version"] = "4"
+    for spanPath in ([path] if isinstance(path, basestring) else path):
+      span = ET.SubElement(spans, "span")
+      span.attrib["type"] = "span"
+      span.attrib["version"] = "4"
+      pathTag = ET.SubElement(span, "path")
+      pathTag.text = spanPath
+    self._register(feed, track)
+    self.dirty = True
+    return feed
+
+  # Compares this document to other - usually the same file as changed on
+  # disk - by version and feed uid. Returns a list of
+  # (track, container, theirs, removed, changed, added) for the versions
+  # (track is None) and the feeds of each track, or None when something
+  # else differs. See diff_children for the last three.
+  def diff(self, other):
+    mine = self._containers()
+    theirs = other._containers()
+    if [key for key, track, container in mine] != [key for key, track, container in theirs]:
+      return None
+    skip = set(container for key, track, container in mine)
+    otherSkip = set(container for key, track, container in theirs)
+    if self.fingerprint(self.getroot(), skip) != other.fingerprint(other.getroot(), otherSkip):
+      return None
+    changes = []
+    for (key, track, container), (otherKey, otherTrack, otherContainer) in zip(mine, theirs):
+      changes.append((track, container, otherContainer) + self.diff_children(container, other, otherContainer))
+    return changes
+
+  def _containers(self):
+    containers = []
+    versions = self.versions_element()
+    if versions is not None:
+      containers.append(('versions', None, versions))
+    for track in self.getroot().findall("tracks/track"):
+      feeds = track.find("feeds")
+      if feeds is not None:
+        containers.append((track.get('uid'), track, feeds))
+    return containers
+
+  # Matches the children of container and theirs (in other) by uid, or by
+  # content for children without one. Returns the children only found
+  # here, the (mine, theirs) pairs whose content differs, and the
+  # (position, element) of the children only found in theirs.
+  def diff_children(self, container, other, theirs):
+    old = OrderedDict((self._diff_key(elem), elem) for elem in container.findall("./*"))
+    new = OrderedDict((other._diff_key(elem), elem) for elem in theirs.findall("./*"))
+    removed = [elem for key, elem in old.items() if key not in new]
+    changed = []
+    added = []
+    for position, (key, elem) in enumerate(new.items()):
+      if key not in old:
+        added.append((position, elem))
+      elif 'uid' in elem.attrib and not self._same(old[key], other, elem):
+        changed.append((old[key], elem))
+    return removed, changed, added
+
+  # A plain comparison is much cheaper than fingerprints, and is enough
+  # for untouched elements.
+  def _same(self, elem, other, theirs):
+    return self._equal(elem, other, theirs) or self.fingerprint(elem) == other.fingerprint(theirs)
+
+  def _equal(self, elem, other, theirs):
+    if elem.tag != theirs.tag or dict(elem.attrib) != dict(theirs.attrib):
+      return False
+    if (elem.text or '') != (theirs.text or '') or len(elem) != len(theirs):
+      return False
+    for child, otherChild in zip(elem, theirs):
+      if (child.tail or '') != (otherChild.tail or '') or not self._equal(child, other, otherChild):
+        return False
+    return True
+
+  def _diff_key(self, elem):
+    return elem.get('uid') or self.fingerprint(elem)
+
+  # Hash of the content of elem. Whitespace only
+  # text is left out, so the same clip written pretty printed or not has
+  # the same fingerprint. The elements in skip only count by their tag.
+  def fingerprint(self, elem, skip = ()):
+    digest = hashlib.sha1()
+    self._fingerprint(elem, skip, digest)
+    return digest.hexdigest()
+
+  def _fingerprint(self, elem, skip, digest):
+    if not isinstance(elem.tag, basestring):
+      return
+    if elem in skip:
+      digest.update(('<%s/>' % elem.tag).encode('utf-8'))
+      return
+    items = sorted(elem.attrib.items())
+    digest.update((u'<%s\0%s\0' % (elem.tag, u'\0'.join(u'%s=%s' % item for item in items))).encode('utf-8'))
+    if elem.text and elem.text.strip():
+      digest.update(elem.text.encode('utf-8'))
+    for child in elem:
+      self._fingerprint(child, skip, digest)
+      if child.tail and child.tail.strip():
+        digest.update(child.tail.encode('utf-8'))
+    digest.update(u'\0>'.encode('utf-8'))
+
+  # Removes versions and their feeds. The last version left becomes the
+  # current one if it was removed. Returns the removed versions.
+  def remove_versions(self, uids):
+    uids = set(uids)
+    versions = self.versions_element()
+    removed = [version for version in versions.findall("version") if version.get('uid') in uids]
+    for version in removed:
+      versions.remove(version)
+    for feeds in self.getroot().findall("tracks/track/feeds"):
+      for feed in feeds.findall("feed"):
+        if feed.get('vuid') in uids:
+          feeds.remove(feed)
+    self.forget()
+    if removed:
+      if self.current_version() in uids:
+        left = self.versions()
+        self.set_current_version(left[-1].get('uid') if left else '')
+      self.dirty = True
+    return removed
+
+  # Uids of all but the last keep versions of each shot type, in file
+  # order. Versions without a type are a type of their own.
+  def superseded_versions(self, keep):
+    byType = OrderedDict()
+    for version in self.versions():
+      feed = self.version_feed(version.get('uid'))
+      shotType = feed.find('userData/shotType') if feed is not None else None
+      byType.setdefault(shotType.text if shotType is not None else None, []).append(version.get('uid'))
+    return [uid for uids in byType.values() for uid in uids[:max(0, len(uids) - keep)]]
+
+  # Uids of the versions whose first file (or frames) can't be found on
+  # disk anymore.
+  def offline_versions(self):
+    offline = []
+    for feed in self.getroot().findall("tracks/track/feeds/feed"):
+      path = self.feed_path(feed)
+      if not path:
+        continue
+      if parsePattern(path) is not None:
+        online = findSequence(path) is not None
+      else:
+        online = os.path.exists(path)
+      if not online and feed.get('vuid') not in offline:
+        offline.append(feed.get('vuid'))
+    return offline
+
+  # Writes the values the panel shows for missing elements : version names
+  # (their uid), shot types (shotType), comments, and the users of feeds
+  # found in users (feed uid -> user). Returns the number of elements
+  # created.
+  def normalize(self, shotType, users = {}):
+    created = []
+    def ensure(parent, tag, text = None, attrib = {}):
+      elem = parent.find(tag)
+      if elem is None:
+        elem = ET.SubElement(parent, tag, attrib)
+        elem.text = text
+        created.append(elem)
+      return elem
+    for version in self.versions():
+      ensure(version, "name", version.get('uid'))
+    for track in self.tracks():
+      for feed in track.findall("feeds/feed"):
+        userData = ensure(feed, "userData", attrib = { 'type': 'dict' })
+        ensure(userData, "shotType", shotType, { 'type': 'string' })
+        if feed.get('uid') in users:
+          ensure(userData, "user", users[feed.get('uid')], { 'type': 'string' })
+        ensure(feed, "comment")
+    if created:
+      self.dirty = True
+    return len(created)
+
+  # Applies an edit recorded by the panel, see clipJournal. Elements are
+  # addressed by the path of their indexes among the child elements, from
+  # the root.
+  def apply_edit(self, edit):
+    op = edit['op']
+    if op == 'current':
+      self.set_current_version(edit['uid'])
+    elif op == 'remove_versions':
+      self.remove_versions(edit['uids'])
+    elif op == 'normalize':
+      self.normalize(edit['shotType'], edit['users'])
+    else:
+      elem = self.getroot()
+      for row in edit['path']:
+        elem = elem.findall("./*")[row]
+      if op == 'text':
+        elem.text = edit['text']
+      elif op == 'attr':
+        elem.attrib[edit['name']] = edit['value']
+      elif op == 'append':
+        child = ET.fromstring(edit['xml'])
+        elem.append(child)
+        self._register(child)
+      else:
+        raise ValueError("Unknown edit %s" % op)
+    self.dirty = True
+
+  def set_current_version(self, uid):
+    self.versions_element().attrib['currentVersion'] = uid
+    for track in self.getroot().findall("tracks/track"):
+      self.feeds_element(track).attrib['currentVersion'] = uid
+    self.dirty = True
+
+class ClipSnapshot(object):
+  def __init__(self, xml):
+    self.xml = xml
+
+  def write(self, f):
+    writeTree(self.xml, f)
+
+  def save(self, filename):
+    debug(filename)
+    return atomicWrite(filename, self.write)
+
+def writeTree(xml, f):
+  try:
+    debug("Writing with lxml")
+    xml.write(f, pretty_print=True)
+  except Exception as e:
+    debug("Writing with python xml : %s" % e)
+    xml.write(f)
+
+# Hashes everything read from or written to f.
+class HashingFile(object):
+  def __init__(self, f):
+    self.f = f
+    self.hash = hashlib.sha1()
+
+  def read(self, size = -1):
+    data = self.f.read(size)
+    self.hash.update(data)
+    return data
+
+  def write(self, data):
+    self.hash.update(data)
+    self.f.write(data)
+
+  def hexdigest(self):
+    return self.hash.hexdigest()
+
+def fileDigest(filename):
+  digest = hashlib.sha1()
+  with open(filename, 'rb') as f:
+    for block in iter(lambda: f.read(1024 * 1024), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+def fileSignature(filename, digest):
+  st = os.stat(filename)
+  return (st.st_mtime, st.st_size, digest)
+
+# Writes to a temporary file next to filename, syncs it to disk, then
+# renames it over filename. A crash or a full disk never leaves a
+# truncated clip behind. Returns the signature of the written file.
+def atomicWrite(filename, write):
+  directory = os.path.dirname(os.path.abspath(filename))
+  try:
+    os.makedirs(directory)
+  except OSError:
+    pass
+  fd, tmp = tempfile.mkstemp(prefix = '.' + os.path.basename(filename) + '.', suffix = '.tmp', dir = directory)
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      hashing = HashingFile(f)
+      write(hashing)
+      f.flush()
+      os.fsync(f.fileno())
+    # A new file gets the mode the umask gives. Where the umask is unknown,
+    # it keeps the owner only mode of mkstemp.
+    try:
+      mode = stat.S_IMODE(os.stat(filename).st_mode)
+    except OSError:
+      mode = 0o666 & ~UMASK if UMASK is not None else None
+    if mode is not None:
+      os.chmod(tmp, mode)
+    if os.name == 'nt' and os.path.exists(filename):
+      os.remove(filename)
+    os.rename(tmp, filename)
+  except:
+    try:
+      os.remove(tmp)
+    except OSError:
+      pass
+    raise
+  try:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+      os.fsync(fd)
+    finally:
+      os.close(fd)
+  except (OSError, AttributeError):
+    pass
+  return fileSignature(filename, hashing.hexdigest())
+
+def copyTree(xml):
+  if hasattr(ET, 'LXML_VERSION'):
+    return copy.deepcopy(xml)
+  return ET.ElementTree(copyElement(xml.getroot()))
+
+# Much faster than deepcopy for ElementTree elements.
+def copyElement(elem):
+  new = ET.Element(elem.tag, dict(elem.attrib))
+  new.text = elem.text
+  new.tail = elem.tail
+  new.extend([copyElement(child) for child in elem])
+  return new
+
+def createVersionTag(versions, vuid, versionName):
+  version = ET.SubElement(versions, "version")
+  version.attrib["type"] = "version"
+  version.attrib["version"] = "3"
+  version.attrib["uid"] = vuid
+  nameTag = ET.SubElement(version, "name")
+  nameTag.text = versionName
+  creationDate = ET.SubElement(version, "creationDate")
+  creationDate.text = datetime.datetime.now().strftime(DATE_FORMATS[0])
+  comment = ET.SubElement(version, "comment")
+  comment.text = "AutoGenerated from nuke"
+  return version
+
+# A creationDate as seconds since the epoch, None if it isn't in one of
+# DATE_FORMATS.
+def parseDate(text):
+  text = (text or '').strip()
+  for dateFormat in DATE_FORMATS:
+    try:
+      return time.mktime(time.strptime(text, dateFormat))
+    except (ValueError, OverflowError):
+      pass
+  return None
+
+# Splits the [first-last] range out of a clip path : (path without the
+# range, first, last), first and last being None without a range.
+def splitFrameRange(path):
+  parsed = parseFramePath(path)
+  if parsed is None or not parsed.ranges:
+    return path, None, None
+  return parsed.head + parsed.tail, parsed.first, parsed.last
+
+# Turns a printf or # path (as used by Read nodes) into the [first-last]
+# form stored in clip spans. Other paths are returned as is.
+def clipPath(path, first, last):
+  parsed = parseFramePath(path)
+  if parsed is None or parsed.ranges:
+    return path
+  return parsed.spanned([(first, last)]).path()
+
+# The file name of a path, without its frame spec nor its extension.
+def versionName(path):
+  parsed = parseFramePath(path)
+  if parsed is None:
+    return os.path.splitext(os.path.basename(path))[0]
+  tail = parsed.tail.rsplit('.', 1)[0] if '.' in parsed.tail else parsed.tail
+  return os.path.basename(parsed.head).rstrip('._') + tail
@@ -0,0 +1,128 @@
+import json
+import os
+from clipDocument import atomicWrite
+
+# Sidecar journal of the edits made to a clip since it was last saved. An
+# edit costs an appended line instead of a rewrite of the whole clip, and
+# edits survive a crash :
+#
+#   journal = ClipJournal("shot.clip")
+#   journal.replay(document)              # right after loading
+#   journal.record({ 'op': 'text', 'path': [1, 0, 2], 'text': "new" })
+#   mark = journal.mark()                 # when taking the snapshot
+#   signature = snapshot.save("shot.clip")
+#   journal.compact(signature[2], mark)   # once it is saved
+#
+# The first line holds the sha1 of the clip the edits apply to, then comes
+# one JSON edit per line (see ClipDocument.apply_edit). Every edit is
+# fsync'ed, a line cut short by a crash is ignored.
+
+SUFFIX = '.journal'
+# Where journals written against another version of the clip are moved.
+STALE_SUFFIX = '.journal.stale'
+
+class ClipJournal(object):
+  def __init__(self, filename):
+    self.filename = filename + SUFFIX
+    # sha1 of the clip the edits apply to, None for a clip never saved.
+    self.base = None
+    # The edits since base, as written.
+    self.lines = []
+    self.size = 0
+    self._file = None
+
+  def exists(self):
+    return os.path.exists(self.filename)
+
+  # (base, edits) of the journal on disk, up to its first unreadable line.
+  def read(self):
+    with open(self.filename, 'rb') as f:
+      lines = f.read().split(b'\n')
+    base = json.loads(lines[0].decode('utf-8'))['base']
+    edits = []
+    for line in lines[1:]:
+      try:
+        edits.append(json.loads(line.decode('utf-8')))
+      except ValueError:
+        break
+    return base, edits
+
+  # Starts recording against document, first applying the edits of a
+  # journal written against the same clip. Returns the number of replayed
+  # edits. A journal written against another clip is moved aside and None
+  # returned.
+  def replay(self, document):
+    base = document.signature[2] if document.signature is not None else None
+    self.start(base)
+    if not self.exists():
+      return 0
+    try:
+      journalBase, edits = self.read()
+    except (IOError, OSError, ValueError, KeyError):
+      journalBase, edits = None, None
+    if edits is None or journalBase != base:
+      self.close()
+      os.rename(self.filename, self.filename[:-len(SUFFIX)] + STALE_SUFFIX)
+      return None
+    for edit in edits:
+      document.apply_edit(edit)
+    # Rewritten, to drop a line cut short.
+    self.lines = [self.encode(edit) for edit in edits]
+    self._rewrite()
+    return len(edits)
+
+  def start(self, base):
+    self.close()
+    self.base = base
+    self.lines = []
+    self.size = 0
+
+  @staticmethod
+  def encode(edit):
+    return json.dumps(edit, separators = (',', ':'), sort_keys = True).encode('ascii')
+
+  # Edits recorded together are fsync'ed once.
+  def record(self, *edits):
+    if self._file is None:
+      if not self.lines:
+        self._rewrite()
+      self._file = open(self.filename, 'ab')
+    lines = [self.encode(edit) for edit in edits]
+    self._file.write(b''.join(line + b'\n' for line in lines))
+    self._file.flush()
+    os.fsync(self._file.fileno())
+    self.lines.extend(lines)
+    self.size += sum(len(line) + 1 for line in lines)
+
+  # Position of the next edit, for compact().
+  def mark(self):
+    return len(self.lines)
+
+  # The clip was saved with the edits before mark, as base. Keeps the ones
+  # made since, removes the journal when there are none.
+  def compact(self, base, mark):
+    self.close()
+    self.base = base
+    self.lines = self.lines[mark:]
+    if self.lines:
+      self._rewrite()
+    else:
+      self.size = 0
+      self.discard()
+
+  def _rewrite(self):
+    self.close()
+    header = json.dumps({ 'base': self.base }).encode('ascii')
+    data = b'\n'.join([header] + self.lines) + b'\n'
+    atomicWrite(self.filename, lambda f: f.write(data))
+    self.size = len(data)
+
+  def discard(self):
+    self.close()
+    if self.exists():
+      os.remove(self.filename)
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
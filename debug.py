@@ -1,9 +1,119 @@
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+import timeit
+
+# Leveled logging and call statistics.
+#
+# OPENCLIP_DEBUG sets the level (error, warning, info, debug, trace or a
+# number), info by default. Messages are only formatted when their level is
+# enabled : debug("data %s", index) costs a comparison otherwise.
+#
+# OPENCLIP_PROFILE=1 makes @traced methods count their calls and time,
+# dumped at exit or with Ctrl+Alt+Shift+P in the panel. Without it @traced
+# returns the method untouched.
+
+ERROR = 40
+WARNING = 30
+INFO = 20
+DEBUG = 10
+TRACE = 5
+LEVELS = { 'error': ERROR, 'warning': WARNING, 'info': INFO, 'debug': DEBUG, 'trace': TRACE }
+
 try:
   import nuke
-  def debug(x):
-    nuke.debug(str(x))
-    return x
+  _write = nuke.debug
 except:
-  def debug(x):
-    print(x)
-    return x
+  def _write(message):
+    print(message)
+
+def parseLevel(value, default = INFO):
+  if not value:
+    return default
+  if value.lower() in LEVELS:
+    return LEVELS[value.lower()]
+  try:
+    return int(value)
+  except ValueError:
+    return default
+
+level = parseLevel(os.environ.get('OPENCLIP_DEBUG'))
+profiling = os.environ.get('OPENCLIP_PROFILE', '') not in ('', '0')
+
+def setLevel(newLevel):
+  global level
+  level = newLevel if isinstance(newLevel, int) else parseLevel(newLevel)
+
+def enabled(messageLevel):
+  return messageLevel >= level
+
+def log(messageLevel, x, *args):
+  if messageLevel >= level:
+    message = str(x) % args if args else str(x)
+    t = time.time()
+    _write("%s.%06d: %s" % (time.strftime("%H:%M:%S", time.localtime(t)), int(t % 1 * 1000000), message))
+  return x
+
+# These return x, so they can wrap an expression.
+def error(x, *args):
+  return log(ERROR, x, *args)
+
+def warning(x, *args):
+  return log(WARNING, x, *args)
+
+def info(x, *args):
+  return log(INFO, x, *args)
+
+def debug(x, *args):
+  return log(DEBUG, x, *args)
+
+def trace(x, *args):
+  return log(TRACE, x, *args)
+
+# Class.method -> [calls, seconds]. The time of a method includes the
+# methods it calls.
+_stats = {}
+_lock = threading.Lock()
+
+def traced(method):
+  if not profiling:
+    return method
+  name = method.__name__
+  @functools.wraps(method)
+  def wrapper(self, *args, **kwargs):
+    start = timeit.default_timer()
+    try:
+      return method(self, *args, **kwargs)
+    finally:
+      elapsed = timeit.default_timer() - start
+      key = "%s.%s" % (type(self).__name__, name)
+      with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+          _stats[key] = [1, elapsed]
+        else:
+          entry[0] += 1
+          entry[1] += elapsed
+  return wrapper
+
+def stats():
+  with _lock:
+    return dict((key, tuple(entry)) for key, entry in _stats.items())
+
+def resetStats():
+  with _lock:
+    _stats.clear()
+
+def dumpStats(write = None):
+  write = write or _write
+  entries = sorted(stats().items(), key = lambda item: item[1][1], reverse = True)
+  write("%-48s %10s %10s %10s" % ("method", "calls", "total ms", "us/call"))
+  for key, (calls, seconds) in entries:
+    write("%-48s %10d %10.1f %10.2f" % (key, calls, seconds * 1000, seconds * 1000000 / calls))
+  return entries
+
+if profiling:
+  atexit.register(dumpStats, lambda message: sys.stderr.write(message + "\n"))
@@ -0,0 +1,109 @@
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+# Parses the frame spec of sequence paths, in any of the forms found in
+# Read nodes and clips :
+#
+#   parseFramePath('/plates/plate_v001.[1001-1100].exr').first  # 1001
+#   parseFramePath('/plates/plate_v001.%04d.exr').frame(1001)   # '/plates/plate_v001.1001.exr'
+#   parseFramePaths(paths)                                      # many at once
+#
+# The spec is the last one of the file name : [first-last], [1-10,15-20],
+# %04d, %d, #### or @@@@. It ends the name or is followed by a . or _, so
+# that 100%done.exr isn't a sequence, name1001.exr being name####.exr.
+# Results are cached, the same paths being parsed over and over by the
+# views.
+
+# Paths kept in the cache, the least recently parsed being dropped first.
+CACHE_SIZE = 10000
+
+RANGE = r'-?\d+(?:--?\d+)?'
+SPEC = re.compile(r'^(.*)(%%0?(\d*)d|(?<!#)#+|(?<!@)@+|\[(%s(?:,%s)*)\])((?:[._][^/\\]*)?)$' % (RANGE, RANGE))
+RANGES = re.compile(r'(-?\d+)(?:-(-?\d+))?')
+
+# A sequence path split around its frame spec. ranges holds the (first,
+# last) runs of frames a [first-last] spec names, printf and # specs name
+# none. padding is 0 for %d.
+class FramePath(namedtuple('FramePath', 'head spec tail padding ranges')):
+  __slots__ = ()
+
+  @property
+  def first(self):
+    return self.ranges[0][0] if self.ranges else None
+
+  @property
+  def last(self):
+    return self.ranges[-1][1] if self.ranges else None
+
+  def frames(self):
+    return [frame for first, last in self.ranges for frame in range(first, last + 1)]
+
+  def frame(self, frame):
+    return '%s%0*d%s' % (self.head, self.padding, frame, self.tail)
+
+  # The same path with printf, # or [first-last] specs.
+  def printf(self):
+    return '%s%%0%dd%s' % (self.head, self.padding, self.tail) if self.padding else '%s%%d%s' % (self.head, self.tail)
+
+  def hashes(self):
+    return '%s%s%s' % (self.head, '#' * max(self.padding, 1), self.tail)
+
+  def spanned(self, ranges):
+    spec = '[%s]' % ','.join('%0*d-%0*d' % (self.padding, first, self.padding, last) for first, last in ranges)
+    return FramePath(self.head, spec, self.tail, self.padding, tuple(tuple(r) for r in ranges))
+
+  def path(self):
+    return self.head + self.spec + self.tail
+
+def parse(path):
+  match = SPEC.match(path)
+  if match is None:
+    return None
+  head, spec, printf, ranges, tail = match.groups()
+  if ranges is not None:
+    runs = tuple((int(first), int(last or first)) for first, last in RANGES.findall(ranges))
+    padding = len(RANGES.match(ranges).group(1).lstrip('-'))
+    return FramePath(head, spec, tail, padding, runs)
+  if printf is not None:
+    return FramePath(head, spec, tail, int(printf or 0), ())
+  return FramePath(head, spec, tail, len(spec), ())
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_missing = object()
+
+def _store(parsed):
+  with _lock:
+    for path, result in parsed:
+      _cache[path] = result
+    while len(_cache) > CACHE_SIZE:
+      _cache.popitem(last = False)
+
+# The FramePath of path, None if it isn't a sequence path.
+def parseFramePath(path):
+  with _lock:
+    result = _cache.pop(path, _missing)
+    if result is not _missing:
+      _cache[path] = result
+      return result
+  result = parse(path)
+  _store([(path, result)])
+  return result
+
+# parseFramePath for each of paths, taking the lock twice for them all.
+def parseFramePaths(paths):
+  found = {}
+  with _lock:
+    for path in paths:
+      result = _cache.pop(path, _missing)
+      if result is not _missing:
+        _cache[path] = found[path] = result
+  parsed = [(path, parse(path)) for path in set(paths) if path not in found]
+  found.update(parsed)
+  _store(parsed)
+  return [found[path] for path in paths]
+
+def clearCache():
+  with _lock:
+    _cache.clear()
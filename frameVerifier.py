@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from framePath import parseFramePaths
+from ownerResolver import stat_names
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+
+# Checks that the frames named by span paths are on disk :
+#
+#   verifier = FrameVerifier()
+#   statuses = verifier.verify(paths)       # span path -> SpanStatus
+#   statuses[path].text()                   # "ok", "12 missing, 1 empty"...
+#
+# Spans are grouped by directory, each directory being listed once and
+# only its frame files stat'ed. Directories are handed to worker threads
+# through a bounded queue. Every verify checks the disk again : a frame
+# rewritten in place doesn't change its directory. The last results are
+# kept for cached().
+
+OK = "ok"
+OFFLINE = "offline"
+# Spans whose frames can't be told, like printf paths without a range.
+UNKNOWN = "unknown"
+# How the modification time of the newest frame is shown.
+NEWEST_FORMAT = '%Y/%m/%d %H:%M:%S'
+
+# What was found on disk for a span : frames is the number of frames it
+# names, missing and empty list the frames missing or of zero bytes,
+# newest is the latest modification time of its frames (None without any).
+class SpanStatus(object):
+  def __init__(self, path, frames, missing = [], empty = [], newest = None):
+    self.path = path
+    self.frames = frames
+    self.missing = missing
+    self.empty = empty
+    self.newest = newest
+
+  def ok(self):
+    return self.frames > 0 and not self.missing and not self.empty
+
+  # With ranges, the frames of each problem follow its count. The time of
+  # the newest frame comes last.
+  def text(self, ranges = False):
+    if not self.frames:
+      return UNKNOWN
+    if len(self.missing) == self.frames:
+      return OFFLINE
+    problems = []
+    for frames, problem in ((self.missing, "missing"), (self.empty, "empty")):
+      if frames:
+        problem = "%d %s" % (len(frames), problem)
+        if ranges and frameRanges(frames):
+          problem += " (%s)" % frameRanges(frames)
+        problems.append(problem)
+    text = ", ".join(problems) or OK
+    if self.newest is not None:
+      text += ", newest %s" % time.strftime(NEWEST_FORMAT, time.localtime(self.newest))
+    return text
+
+  def __repr__(self):
+    return "<SpanStatus %s : %s>" % (self.path, self.text())
+
+# The status of all the spans of a feed.
+def mergeStatuses(statuses):
+  newest = [status.newest for status in statuses if status.newest is not None]
+  if any(not status.frames for status in statuses):
+    return SpanStatus(None, 0)
+  return SpanStatus(None, sum(status.frames for status in statuses),
+                    [frame for status in statuses for frame in status.missing],
+                    [frame for status in statuses for frame in status.empty],
+                    max(newest) if newest else None)
+
+# "1001-1003, 1010" for frames 1001, 1002, 1003 and 1010.
+def frameRanges(frames):
+  ranges = []
+  for frame in sorted(frame for frame in frames if frame is not None):
+    if ranges and ranges[-1][1] == frame - 1:
+      ranges[-1][1] = frame
+    else:
+      ranges.append([frame, frame])
+  return ", ".join(str(first) if first == last else "%d-%d" % (first, last) for first, last in ranges)
+
+# The SpanStatus of (path, FramePath) spans all in directory, listing it
+# once.
+def verifyDirectory(directory, spans):
+  files = {}
+  for path, parsed in spans:
+    if parsed is None:
+      files[path] = [(None, os.path.basename(path))]
+    else:
+      prefix, padding, tail = os.path.basename(parsed.head), parsed.padding, parsed.tail
+      files[path] = [(frame, '%s%0*d%s' % (prefix, padding, frame, tail)) for frame in parsed.frames()]
+  stats = stat_names(directory, set(name for names in files.values() for frame, name in names))
+  statuses = []
+  for path, parsed in spans:
+    found = [(frame, stats.get(name)) for frame, name in files[path]]
+    missing = [frame for frame, st in found if st is None]
+    empty = [frame for frame, st in found if st is not None and st.st_size == 0]
+    mtimes = [st.st_mtime for frame, st in found if st is not None]
+    statuses.append(SpanStatus(path, len(found), missing, empty, max(mtimes) if mtimes else None))
+  return statuses
+
+class FrameVerifier(object):
+  def __init__(self, threads = 8, queue_size = 64):
+    self.threads = threads
+    self.queue_size = queue_size
+    self._lock = threading.Lock()
+    # span path -> SpanStatus of the last verify
+    self._statuses = {}
+
+  def cached(self, path):
+    return self._statuses.get(path)
+
+  def invalidate(self):
+    with self._lock:
+      self._statuses.clear()
+
+  # Verifies the frames of paths, returning span path -> SpanStatus. With
+  # a callback, the statuses of each directory are also handed to it as
+  # they come - from a worker thread.
+  def verify(self, paths, callback = None):
+    directories = {}
+    order = []
+    unknown = []
+    for path, parsed in zip(paths, parseFramePaths(paths)):
+      if parsed is not None and not parsed.ranges:
+        unknown.append(SpanStatus(path, 0))
+        continue
+      directory = os.path.dirname(path)
+      if directory not in directories:
+        directories[directory] = []
+        order.append(directory)
+      directories[directory].append((path, parsed))
+    self._store(unknown)
+    if callback is not None and unknown:
+      callback(unknown)
+    tasks = queue.Queue(self.queue_size)
+    results = dict((status.path, status) for status in unknown)
+    errors = []
+    def work():
+      while True:
+        task = tasks.get()
+        if task is None:
+          return
+        try:
+          statuses = verifyDirectory(*task)
+          self._store(statuses)
+          with self._lock:
+            results.update((status.path, status) for status in statuses)
+          if callback is not None:
+            callback(statuses)
+        except Exception as e:
+          errors.append(e)
+    workers = [threading.Thread(target = work) for i in range(min(self.threads, len(order)))]
+    for worker in workers:
+      worker.daemon = True
+      worker.start()
+    for directory in order:
+      tasks.put((directory or '.', directories[directory]))
+    for worker in workers:
+      tasks.put(None)
+    for worker in workers:
+      worker.join()
+    if errors:
+      raise errors[0]
+    return results
+
+  def _store(self, statuses):
+    with self._lock:
+      for status in statuses:
+        self._statuses[status.path] = status
@@ -1,18 +1,6 @@
 import PySide.QtCore as QtCore
 import PySide.QtGui as QtGui
-
-import datetime
-
-try:
-  import nuke
-  def debug(x):
-    nuke.debug("%s: %s" % (datetime.datetime.now().strftime("%H:%M:%S.%f"), str(x)))
-    return x
-except:
-  def debug(x):
-    print("%s: %s" % (datetime.datetime.now().strftime("%H:%M:%S.%f"), str(x)))
-    return x
-
+from debug import traced
 
 
 class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
@@ -25,6 +13,7 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
 
   # def dropMimeData
 
+  @traced
   def index(self, row, column, parent):
     assert parent.model() == self if parent.isValid() else True
     sourceParent = self.mapToSource(parent)
@@ -37,6 +26,7 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
   # def insertColumns
   # def insertRows
 
+  @traced
   def mapFromSource(self, sourceIndex):
     if self.sourceModel() is None or not sourceIndex.isValid():
       return QtCore.QModelIndex()
@@ -46,6 +36,7 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
   # def mapSelectionFromSource
   # def mapSelectionToSource
 
+  @traced
   def mapToSource(self, proxyIndex):
     if self.sourceModel() is None or not proxyIndex.isValid():
       return QtCore.QModelIndex()
@@ -54,6 +45,7 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
 
   # def match
 
+  @traced
   def parent(self, child):
     # assert child.model() == self if child.isValid() else True
     sourceIndex = self.mapToSource(child)
@@ -63,6 +55,7 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
   # def removeColumns
   # def removeRows
 
+  @traced
   def rowCount(self, parent):
     assert parent.model() == self if parent.isValid() else True
     return self.sourceModel().rowCount(self.mapToSource(parent))
@@ -79,8 +72,8 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
     if self.sourceModel() is not None:
       self.sourceModel().rowsAboutToBeInserted.connect(self.sourceRowsAboutToBeInserted)
       self.sourceModel().rowsInserted.connect(self.sourceRowsInserted)
-      #self.sourceModel().rowsAboutToBeRemoved.connect(self.sourceRowsAboutToBeRemoved)
-      #self.sourceModel().rowsRemoved.connect(self.sourceRowsRemoved)
+      self.sourceModel().rowsAboutToBeRemoved.connect(self.sourceRowsAboutToBeRemoved)
+      self.sourceModel().rowsRemoved.connect(self.sourceRowsRemoved)
       #self.sourceModel().rowsAboutToBeMoved.connect(self.sourceRowsAboutToBeMoved)
       #self.sourceModel().rowsMoved.connect(self.sourceRowsMoved)
       #self.sourceModel().columnsAboutToBeInserted.connect(self.sourceColumnsAboutToBeInserted)
@@ -89,8 +82,8 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
       #self.sourceModel().columnsRemoved.connect(self.sourceColumnsRemoved)
       #self.sourceModel().columnsAboutToBeMoved.connect(self.sourceColumnsAboutToBeMoved)
       #self.sourceModel().columnsMoved.connect(self.sourceColumnsMoved)
-      #self.sourceModel().modelAboutToBeReset.connect(self.sourceModelAboutToBeReset)
-      #self.sourceModel().modelReset.connect(self.sourceModelReset)
+      self.sourceModel().modelAboutToBeReset.connect(self.sourceModelAboutToBeReset)
+      self.sourceModel().modelReset.connect(self.sourceModelReset)
       self.sourceModel().dataChanged.connect(self.sourceDataChanged)
       #self.sourceModel().headerDataChanged.connect(self.sourceHeaderDataChanged)
       #self.sourceModel().layoutAboutToBeChanged.connect(self.sourceLayoutAboutToBeChanged)
@@ -105,6 +98,20 @@ class MyIdentityProxyModel(QtGui.QAbstractProxyModel):
     assert parent.model() == self.sourceModel() if parent.isValid() else True
     self.endInsertRows()
 
+  def sourceRowsAboutToBeRemoved(self, parent, start, end):
+    assert parent.model() == self.sourceModel() if parent.isValid() else True
+    self.beginRemoveRows(self.mapFromSource(parent), start, end)
+
+  def sourceRowsRemoved(self, parent, start, end):
+    assert parent.model() == self.sourceModel() if parent.isValid() else True
+    self.endRemoveRows()
+
+  def sourceModelAboutToBeReset(self):
+    self.beginResetModel()
+
+  def sourceModelReset(self):
+    self.endResetModel()
+
   def sourceDataChanged(self, topLeft, bottomRight):
     assert topLeft.model() == self.sourceModel() if topLeft.isValid() else True
     assert bottomRight.model() == self.sourceModel() if bottomRight.isValid() else True
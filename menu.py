@@ -1,8 +1,8 @@
 import nuke
-import add_clip
+import openClipPanel
 
 def debug(x):
   nuke.debug(str(x))
   return x
 
-add_clip.myinit()
+openClipPanel.register()
@@ -0,0 +1,179 @@
+import sys
+
+# Stand-in for the nuke module, for benchmarks and scripts run outside of
+# Nuke. It records the calls made to it in calls, as (name, args, kwargs).
+#
+#   import nukeStub
+#   nukeStub.install()
+#   nukeStub.select(nukeStub.nodes.Read(file = "/plates/plate.%04d.exr", first = 1001, last = 1100))
+#   import add_clip
+
+GUI = True
+calls = []
+answer = True
+_nodes = []
+
+def record(call, *args, **kwargs):
+  calls.append((call, args, kwargs))
+
+def reset():
+  del calls[:]
+  del _nodes[:]
+
+# Makes import nuke return this module.
+def install():
+  sys.modules['nuke'] = sys.modules[__name__]
+  return sys.modules[__name__]
+
+class Knob(object):
+  def __init__(self, node, name, value = None):
+    self.node = node
+    self._name = name
+    self._value = value
+
+  def name(self):
+    return self._name
+
+  def value(self):
+    return self._value
+
+  def getValue(self):
+    return self._value
+
+  def setValue(self, value):
+    record('setValue', self.node.name(), self._name, value)
+    self._value = value
+
+class Node(object):
+  def __init__(self, nodeClass, **knobs):
+    self._class = nodeClass
+    self._knobs = {}
+    self._inputs = {}
+    self._children = []
+    self._selected = False
+    self._parent = None
+    knobs.setdefault('name', '%s%d' % (nodeClass, 1 + sum(1 for node in _nodes if node._class == nodeClass)))
+    knobs.setdefault('xpos', 0)
+    knobs.setdefault('ypos', 0)
+    for name, value in knobs.items():
+      self._knobs[name] = Knob(self, name, value)
+    _nodes.append(self)
+
+  def Class(self):
+    return self._class
+
+  def name(self):
+    return self._knobs['name'].value()
+
+  def knob(self, name):
+    return self._knobs.get(name, None)
+
+  def knobs(self):
+    return dict(self._knobs)
+
+  def __getitem__(self, name):
+    if name not in self._knobs:
+      self._knobs[name] = Knob(self, name)
+    return self._knobs[name]
+
+  def setInput(self, i, node):
+    record('setInput', self.name(), i, node.name() if node is not None else None)
+    self._inputs[i] = node
+    return True
+
+  def input(self, i):
+    return self._inputs.get(i, None)
+
+  def inputs(self):
+    return max(self._inputs.keys()) + 1 if self._inputs else 0
+
+  def xpos(self):
+    return self._knobs['xpos'].value()
+
+  def ypos(self):
+    return self._knobs['ypos'].value()
+
+  def setXYpos(self, x, y):
+    record('setXYpos', self.name(), x, y)
+    self._knobs['xpos']._value = x
+    self._knobs['ypos']._value = y
+
+  def screenWidth(self):
+    return 80
+
+  def screenHeight(self):
+    return 18
+
+  def setSelected(self, selected):
+    self._selected = selected
+
+  def isSelected(self):
+    return self._selected
+
+  # Groups
+  def nodes(self):
+    return list(self._children)
+
+  def begin(self):
+    return self
+
+  def end(self):
+    pass
+
+  def __repr__(self):
+    return "<%s %s>" % (self._class, self.name())
+
+# nodes.Read(file = ...) and the like create nodes.
+class _Nodes(object):
+  def __getattr__(self, nodeClass):
+    if nodeClass.startswith('_'):
+      raise AttributeError(nodeClass)
+    def create(**knobs):
+      record('nodes.%s' % nodeClass, **knobs)
+      return Node(nodeClass, **knobs)
+    return create
+
+nodes = _Nodes()
+
+def createNode(nodeClass, knobs = '', inpanel = True):
+  record('createNode', nodeClass, knobs)
+  return Node(nodeClass)
+
+def add(group, node):
+  if node._parent is not None:
+    node._parent._children.remove(node)
+  node._parent = group
+  group._children.append(node)
+
+def select(*selection):
+  for node in _nodes:
+    node._selected = node in selection
+
+def allNodes(nodeClass = None, group = None):
+  found = group.nodes() if group is not None else [node for node in _nodes if node._parent is None]
+  return [node for node in found if nodeClass is None or node.Class() == nodeClass]
+
+def selectedNodes(nodeClass = None):
+  return [node for node in _nodes if node._selected and (nodeClass is None or node.Class() == nodeClass)]
+
+def selectedNode():
+  selected = selectedNodes()
+  if not selected:
+    raise ValueError("no node selected")
+  return selected[-1]
+
+def toNode(name):
+  for node in _nodes:
+    if node.name() == name:
+      return node
+  return None
+
+def debug(message):
+  record('debug', message)
+
+def message(message):
+  record('message', message)
+
+def ask(message):
+  record('ask', message)
+  return answer
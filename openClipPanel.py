@@ -0,0 +1,24 @@
+import nuke
+
+# Registers the Open Clip panel from menu.py without importing add_clip,
+# which pulls in PySide, lxml and the whole implementation : Nuke only
+# evaluates the widget string when the panel is first created. Batch and
+# render sessions, which load menu.py too, don't register anything.
+
+NAME = 'Open Clip'
+ID = 'im.cmc.OpenClipWindow'
+
+def createWindow():
+  import add_clip
+  return add_clip.OpenClipWindow()
+
+def register():
+  if not nuke.GUI:
+    return False
+  try:
+    from nukescripts import panels
+    panels.registerWidgetAsPanel('__import__("openClipPanel").createWindow', NAME, ID)
+  except Exception as e:
+    nuke.debug("Couldn't register panel : %s" % e)
+    return False
+  return True
@@ -0,0 +1,152 @@
+import os
+import pwd
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from debug import warning
+
+try:
+  from os import scandir
+except ImportError:
+  try:
+    from scandir import scandir
+  except ImportError:
+    scandir = None
+
+UNKNOWN = "unknown"
+
+def stat_names(directory, names):
+  # Stats every wanted entry of a directory in one pass. Missing entries
+  # (or an unreadable directory) are simply absent from the result.
+  stats = {}
+  try:
+    if scandir is not None:
+      for entry in scandir(directory):
+        if entry.name in names:
+          try:
+            stats[entry.name] = entry.stat()
+          except OSError:
+            pass
+    else:
+      for name in set(os.listdir(directory)) & set(names):
+        try:
+          stats[name] = os.stat(os.path.join(directory, name))
+        except OSError:
+          pass
+  except OSError:
+    pass
+  return stats
+
+# Resolves the owner of files on a thread pool. owner() never blocks: it
+# returns the cached owner, or None after queueing the lookup. Lookups
+# queued for the same directory are batched into a single scan, and the
+# results are handed to callback(results) - from a worker thread - as a
+# list of (path, owner) tuples. A directory scan also checks the files of
+# the directory already cached : the ones replaced since (whose mtime
+# changed) get their owner again, and are handed to callback too.
+class OwnerResolver(object):
+  def __init__(self, callback, threads = 4, ttl = 300.0):
+    self.callback = callback
+    self.threads = threads
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._pool = None
+    # path -> (mtime, owner, expiry), mtime None for a missing file.
+    self._owners = {}
+    # directory -> its paths in _owners
+    self._directories = {}
+    self._names = {}
+    self._pending = {}
+    self._next_sweep = time.time() + ttl
+
+  def owner(self, path):
+    now = time.time()
+    with self._lock:
+      entry = self._owners.get(path)
+      if entry is not None and entry[2] > now:
+        return entry[1]
+      directory = os.path.dirname(path)
+      if directory in self._pending:
+        self._pending[directory].add(path)
+        return None
+      self._pending[directory] = set([path])
+      if self._pool is None:
+        self._pool = ThreadPool(self.threads)
+      pool = self._pool
+    pool.apply_async(self._resolve, (directory,))
+    return None
+
+  def cached(self, path):
+    entry = self._owners.get(path)
+    if entry is not None and entry[2] > time.time():
+      return entry[1]
+    return None
+
+  def invalidate(self, path = None):
+    with self._lock:
+      if path is None:
+        self._owners.clear()
+        self._directories.clear()
+        self._names.clear()
+      elif self._owners.pop(path, None) is not None:
+        self._forget(path)
+
+  # Stops the pool, dropping the queued lookups. owner() starts a new one.
+  def close(self):
+    with self._lock:
+      pool, self._pool = self._pool, None
+      self._pending.clear()
+    if pool is not None:
+      pool.terminate()
+
+  def _user_name(self, uid, now):
+    entry = self._names.get(uid)
+    if entry is not None and entry[1] > now:
+      return entry[0]
+    try:
+      name = pwd.getpwuid(uid).pw_name
+    except KeyError:
+      name = str(uid)
+    self._names[uid] = (name, now + self.ttl)
+    return name
+
+  def _resolve(self, directory):
+    with self._lock:
+      paths = self._pending.pop(directory, set())
+      known = self._directories.get(directory, set()) - paths
+    stats = stat_names(directory, set(os.path.basename(path) for path in paths | known))
+    now = time.time()
+    results = []
+    with self._lock:
+      for path in paths | known:
+        entry = self._owners.get(path)
+        st = stats.get(os.path.basename(path))
+        mtime = st.st_mtime if st is not None else None
+        if path in known and (entry is None or entry[0] == mtime):
+          continue
+        owner = self._user_name(st.st_uid, now) if st is not None else UNKNOWN
+        self._owners[path] = (mtime, owner, now + self.ttl)
+        self._directories.setdefault(directory, set()).add(path)
+        if path in paths or owner != entry[1]:
+          results.append((path, owner))
+      if now > self._next_sweep:
+        self._evict(now)
+    try:
+      self.callback(results)
+    except Exception as e:
+      warning("Owner callback failed : %s", e)
+
+  def _forget(self, path):
+    paths = self._directories.get(os.path.dirname(path))
+    if paths is not None:
+      paths.discard(path)
+      if not paths:
+        del self._directories[os.path.dirname(path)]
+
+  def _evict(self, now):
+    for path in [p for p, entry in self._owners.items() if entry[2] <= now]:
+      del self._owners[path]
+      self._forget(path)
+    for uid in [u for u, entry in self._names.items() if entry[1] <= now]:
+      del self._names[uid]
+    self._next_sweep = now + self.ttl
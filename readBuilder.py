@@ -0,0 +1,93 @@
+import math
+import os
+import nuke
+from framePath import parseFramePaths
+from sequenceScanner import findSequences
+
+# Creates the Read nodes of clip versions, all at once :
+#
+#   createReadNodes([(['/plates/plate_v001.[1001-1100].exr'], 'plate_v001')], contactSheet = True)
+#
+# Everything about the files - parsing the span paths and looking the
+# frames up on disk, in parallel - is worked out before the first node is
+# created. The nodes are then laid out in a grid under the existing ones,
+# and with contactSheet wired into a ContactSheet.
+
+# Room left between the nodes of the grid.
+SPACING = 40
+
+# What a Read node is created with. first and last are None for a file
+# that isn't a sequence, missing is None when its frames aren't on disk.
+class ReadSettings(object):
+  def __init__(self, path, first, last, name, missing = None):
+    self.path = path
+    self.first = first
+    self.last = last
+    self.name = name
+    self.missing = missing
+
+  def label(self):
+    if self.missing is None:
+      return "%s\noffline" % self.name
+    if self.missing:
+      return "%s\n%d missing" % (self.name, self.missing)
+    return self.name
+
+  def __repr__(self):
+    return "<ReadSettings %s %s-%s>" % (self.path, self.first, self.last)
+
+# The ReadSettings of (paths, name) reads, paths holding one path per
+# span. The range spans all the spans, clipped to the frames on disk.
+def readSettings(reads):
+  settings = []
+  for paths, name in reads:
+    parsed = parseFramePaths(paths)
+    ranges = [run for span in parsed if span is not None for run in span.ranges]
+    if not ranges:
+      settings.append(ReadSettings(paths[0], None, None, name, 0 if os.path.exists(paths[0]) else None))
+      continue
+    first, last = min(run[0] for run in ranges), max(run[1] for run in ranges)
+    path = [span for span in parsed if span is not None and span.ranges][0].hashes()
+    settings.append(ReadSettings(path, first, last, name))
+  sequenceReads = [(read, paths[0]) for read, (paths, name) in zip(settings, reads) if read.first is not None]
+  for (read, path), sequence in zip(sequenceReads, findSequences([path for read, path in sequenceReads])):
+    if sequence is not None:
+      sequence = sequence.clipped(read.first, read.last)
+    if sequence is not None:
+      read.first, read.last = sequence.first, sequence.last
+      read.missing = len(sequence.missing())
+  return settings
+
+# Where to put new nodes : left aligned with and under the existing ones.
+def freeCorner():
+  existing = nuke.allNodes()
+  if not existing:
+    return 0, 0
+  return min(node.xpos() for node in existing), max(node.ypos() + node.screenHeight() for node in existing) + SPACING
+
+def createReadNodes(reads, contactSheet = False):
+  settings = readSettings(reads)
+  if not settings:
+    return []
+  left, top = freeCorner()
+  columns = int(math.ceil(math.sqrt(len(settings))))
+  rows = int(math.ceil(len(settings) / float(columns)))
+  nodes = []
+  for read in settings:
+    node = nuke.nodes.Read(file = read.path, label = read.label())
+    if read.first is not None:
+      node['origfirst'].setValue(read.first)
+      node['first'].setValue(read.first)
+      node['origlast'].setValue(read.last)
+      node['last'].setValue(read.last)
+    nodes.append(node)
+  width = max(node.screenWidth() for node in nodes) + SPACING
+  height = max(node.screenHeight() for node in nodes) + SPACING
+  for i, node in enumerate(nodes):
+    node.setXYpos(left + (i % columns) * width, top + (i // columns) * height)
+  if contactSheet:
+    sheet = nuke.nodes.ContactSheet(rows = rows, columns = columns)
+    for i, node in enumerate(nodes):
+      sheet.setInput(i, node)
+    sheet.setXYpos(left + (columns - 1) * width // 2, top + rows * height)
+  return nodes
@@ -0,0 +1,226 @@
+import os
+import re
+from multiprocessing.pool import ThreadPool
+from framePath import parseFramePath
+
+try:
+  from os import scandir
+except ImportError:
+  try:
+    from scandir import scandir
+  except ImportError:
+    scandir = None
+
+try:
+  basestring
+except NameError:
+  basestring = str
+
+# name.1001.exr, name_1001.exr, 1001.exr... The frame number is the last
+# group of digits before the extension, after a . or _ : comp_v001.exr is
+# no frame.
+FRAME_FILE = re.compile(r'^(.*?[._]|)(\d+)(\.[^.\d][^.]*)$')
+# Files that are never frames, however they are named : take_001.mov and
+# take_002.mov are two takes.
+MOVIE_EXTENSIONS = set(['.mov', '.mp4', '.m4v', '.avi', '.mkv', '.mxf', '.webm', '.mpg', '.mpeg', '.wmv', '.r3d', '.braw',
+                        '.wav', '.aif', '.aiff', '.mp3'])
+DIGITS = re.compile(r'^[0-9]+$')
+
+# Frames of one sequence found on disk. unpadded sequences have no frame
+# number starting with a zero, their padding is 0 when their frame numbers
+# have different lengths.
+class Sequence(object):
+  def __init__(self, directory, prefix, padding, extension, frames, unpadded = False):
+    self.directory = directory
+    self.prefix = prefix
+    self.padding = padding
+    self.extension = extension
+    self.frames = sorted(frames)
+    self.unpadded = unpadded
+
+  @property
+  def first(self):
+    return self.frames[0]
+
+  @property
+  def last(self):
+    return self.frames[-1]
+
+  # (first, last) runs of consecutive frames.
+  def ranges(self):
+    ranges = []
+    for frame in self.frames:
+      if ranges and ranges[-1][1] == frame - 1:
+        ranges[-1][1] = frame
+      else:
+        ranges.append([frame, frame])
+    return [tuple(r) for r in ranges]
+
+  def holes(self):
+    ranges = self.ranges()
+    return [(a[1] + 1, b[0] - 1) for a, b in zip(ranges, ranges[1:])]
+
+  def missing(self):
+    return [frame for first, last in self.holes() for frame in range(first, last + 1)]
+
+  # The frames from first to last, None if there are none.
+  def clipped(self, first, last):
+    frames = [frame for frame in self.frames if first <= frame <= last]
+    if not frames:
+      return None
+    return Sequence(self.directory, self.prefix, self.padding, self.extension, frames, self.unpadded)
+
+  # Whether a path padded with padding names these frames. %d paths
+  # (padding 0) and [1-120] ones (padding 1) name unpadded ones.
+  def matches(self, padding):
+    return padding == self.padding or (padding <= 1 and self.unpadded)
+
+  def path(self, frame):
+    return os.path.join(self.directory, '%s%0*d%s' % (self.prefix, self.padding, frame, self.extension))
+
+  # printf style, as Read nodes want it.
+  def pattern(self):
+    spec = '%%0%dd' % self.padding if self.padding else '%d'
+    return os.path.join(self.directory, self.prefix + spec + self.extension)
+
+  # The [first-last] paths to store in clip spans, one per run of frames.
+  def span_paths(self):
+    return [os.path.join(self.directory, '%s[%0*d-%0*d]%s' % (self.prefix, self.padding, first, self.padding, last, self.extension))
+            for first, last in self.ranges()]
+
+  def __repr__(self):
+    return "<Sequence %s %d-%d, %d missing>" % (self.pattern(), self.first, self.last, len(self.missing()))
+
+def listDirectory(directory):
+  files = []
+  directories = []
+  try:
+    if scandir is not None:
+      for entry in scandir(directory):
+        if entry.name.startswith('.'):
+          continue
+        try:
+          if entry.is_dir():
+            directories.append(entry.path)
+          else:
+            files.append(entry.name)
+        except OSError:
+          pass
+    else:
+      # Without scandir, telling directories apart costs a stat. Frame
+      # files are taken for files without one.
+      for name in os.listdir(directory):
+        if name.startswith('.'):
+          continue
+        if frameFile(name) is None and os.path.isdir(os.path.join(directory, name)):
+          directories.append(os.path.join(directory, name))
+        else:
+          files.append(name)
+  except OSError:
+    pass
+  return files, directories
+
+# (prefix, frame number, extension) of a frame file name, None if it isn't
+# one.
+def frameFile(name):
+  match = FRAME_FILE.match(name)
+  if match is None or match.group(3).lower() in MOVIE_EXTENSIONS:
+    return None
+  return match.groups()
+
+# Groups the file names of a directory into sequences, by prefix, padding
+# and extension. Files without a frame number are left out. Frame numbers
+# starting with a zero give the padding, the ones as long go with them.
+# The others are one unpadded sequence, whatever their length : r.1.exr to
+# r.120.exr are r.%d.exr.
+def groupFiles(directory, names):
+  frames = {}
+  for name in names:
+    parts = frameFile(name)
+    if parts is not None:
+      prefix, frame, extension = parts
+      frames.setdefault((prefix, extension), []).append(frame)
+  return groupFrames(directory, frames)
+
+# The sequences of (prefix, extension) -> frame numbers, see groupFiles.
+def groupFrames(directory, frames):
+  sequences = []
+  for (prefix, extension), numbers in sorted(frames.items()):
+    paddings = set(len(number) for number in numbers if len(number) > 1 and number[0] == '0')
+    groups = {}
+    for number in numbers:
+      groups.setdefault(len(number) if len(number) in paddings else None, []).append(int(number))
+    for padding, group in sorted(groups.items(), key = lambda item: item[0] or 0):
+      if padding is None:
+        lengths = set(len(str(frame)) for frame in group)
+        padding = lengths.pop() if len(lengths) == 1 else 0
+        sequences.append(Sequence(directory, prefix, padding, extension, group, unpadded = True))
+      else:
+        sequences.append(Sequence(directory, prefix, padding, extension, group))
+  return sequences
+
+def scanDirectory(directory):
+  files, directories = listDirectory(directory)
+  return groupFiles(directory, files), directories
+
+# Finds the sequences of directories, each directory being listed on a
+# thread of the pool. Subdirectories are scanned too when recursive.
+def scan(directories, recursive = False, threads = 8):
+  if isinstance(directories, basestring):
+    directories = [directories]
+  sequences = []
+  pending = [os.path.abspath(directory) for directory in directories]
+  pool = ThreadPool(threads) if len(pending) > 1 or recursive else None
+  try:
+    while pending:
+      if pool is None:
+        results = [scanDirectory(directory) for directory in pending]
+      else:
+        results = pool.map(scanDirectory, pending, chunksize = 1)
+      pending = []
+      for found, subdirectories in results:
+        sequences.extend(found)
+        if recursive:
+          pending.extend(subdirectories)
+  finally:
+    if pool is not None:
+      pool.terminate()
+  return sorted(sequences, key = lambda sequence: sequence.pattern())
+
+# Splits a sequence path, in any of the forms framePath reads, into
+# (directory, prefix, padding, extension). None if it isn't one.
+def parsePattern(path):
+  parsed = parseFramePath(path)
+  if parsed is None:
+    return None
+  directory, prefix = os.path.split(parsed.head)
+  return directory, prefix, parsed.padding, parsed.tail
+
+# findSequence for each of paths, on a thread pool when there are several.
+def findSequences(paths, threads = 8):
+  if len(paths) < 2:
+    return [findSequence(path) for path in paths]
+  pool = ThreadPool(min(threads, len(paths)))
+  try:
+    return pool.map(findSequence, paths, chunksize = 1)
+  finally:
+    # terminate() doesn't wait for the threads of a ThreadPool to end.
+    pool.close()
+    pool.join()
+
+# The frames on disk of a sequence path, or None when there is none.
+def findSequence(path):
+  parsed = parsePattern(path)
+  if parsed is None:
+    return None
+  directory, prefix, padding, extension = parsed
+  files, directories = listDirectory(directory or '.')
+  # The prefix and extension are known : any name between them is a frame,
+  # plate1001.exr included.
+  end = len(extension)
+  numbers = [name[len(prefix):len(name) - end] for name in files
+             if name.startswith(prefix) and name.endswith(extension) and len(name) > len(prefix) + end]
+  for sequence in groupFrames(directory, { (prefix, extension): [number for number in numbers if DIGITS.match(number)] }):
+    if sequence.matches(padding):
+      return sequence
+  return None
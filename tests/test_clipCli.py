@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clipCli
+from clipDocument import ClipDocument
+
+try:
+  from StringIO import StringIO
+except ImportError:
+  from io import StringIO
+
+class ClipCliTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.clip = self.path('shot.clip')
+    self.cwd = os.getcwd()
+    os.chdir(self.directory)
+
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.directory)
+
+  def path(self, *names):
+    return os.path.join(self.directory, *names)
+
+  def touch(self, directory, names):
+    if not os.path.isdir(self.path(directory)):
+      os.makedirs(self.path(directory))
+    for name in names:
+      with open(self.path(directory, name), 'w') as f:
+        f.write('x')
+
+  # (exit code, printed lines) of add_clip.py argv.
+  def run_cli(self, *argv):
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+      code = clipCli.main(['-c', self.clip] + list(argv))
+      return code, sys.stdout.getvalue().splitlines()
+    finally:
+      sys.stdout = stdout
+
+  def paths(self):
+    document = ClipDocument.load(self.clip)
+    return [document.feed_paths(feed) for feed in document.feeds()]
+
+  def names(self):
+    return [version.findtext('name') for version in ClipDocument.load(self.clip).versions()]
+
+  def test_paths(self):
+    code, lines = self.run_cli('plates/a.%04d.exr:1001-1010', 'plates/b.####.exr', '1', '5')
+    self.assertEqual(code, 1)
+    code, lines = self.run_cli('plates/a.%04d.exr:1001-1010', 'plates/b.[1-5].exr', os.path.join('plates', 'm.mov'))
+    self.assertEqual(code, 0)
+    self.assertEqual(self.paths(), [[self.path('plates', 'a.[1001-1010].exr')], [self.path('plates', 'b.[1-5].exr')], [self.path('plates', 'm.mov')]])
+    self.assertEqual(self.names(), ['a', 'b', 'm'])
+    code, lines = self.run_cli(self.path('plates', 'a.[1001-1010].exr'))
+    self.assertEqual(lines[-1], "0 added, 1 already in %s" % self.clip)
+
+  def test_manifests(self):
+    with open(self.path('m.txt'), 'w') as f:
+      f.write("# plates\nplates/a.%04d.exr 1 10\n\nplates/b.####.exr:1-2\n")
+    with open(self.path('m.json'), 'w') as f:
+      json.dump(['plates/c.[1-3].exr', { 'path': 'plates/d.%02d.exr', 'first': 1, 'last': 4, 'name': 'dee' }], f)
+    self.assertEqual(self.run_cli('-m', 'm.txt', '-m', 'm.json', '--current')[0], 0)
+    self.assertEqual(self.names(), ['a', 'b', 'c', 'dee'])
+    self.assertEqual(self.paths()[3], [self.path('plates', 'd.[01-04].exr')])
+    document = ClipDocument.load(self.clip)
+    self.assertEqual(document.current_version(), document.versions()[-1].get('uid'))
+
+  def test_scan(self):
+    self.touch('renders', ['r.%d.exr' % frame for frame in range(1, 121)])
+    self.touch(os.path.join('renders', 'sub'), ['s.%04d.exr' % frame for frame in (1, 2, 4)])
+    code, lines = self.run_cli('-s', 'renders', '-r')
+    self.assertEqual(self.paths(), [[self.path('renders', 'r.[1-120].exr')],
+                                    [self.path('renders', 'sub', 's.[0001-0002].exr'), self.path('renders', 'sub', 's.[0004-0004].exr')]])
+
+  # Versioned movies and stills aren't frames of one sequence.
+  def test_glob_versions(self):
+    self.touch('takes', ['comp_v001.mov', 'comp_v002.mov', 'take_001.mov', 'take_002.mov', 'still_v1.exr', 'still_v2.exr',
+                         'a_%04d.exr' % 1, 'a_%04d.exr' % 2])
+    self.run_cli('-g', os.path.join('takes', '*'), '-s', 'takes')
+    self.assertEqual(self.paths(), [[self.path('takes', name)] for name in ('comp_v001.mov', 'comp_v002.mov', 'still_v1.exr', 'still_v2.exr',
+                                                                              'take_001.mov', 'take_002.mov')] +
+                                   [[self.path('takes', 'a_[0001-0002].exr')]])
+
+  def test_dry_run(self):
+    self.run_cli('a.[1-2].exr', 'b.[1-2].exr', 'c.[1-2].exr')
+    before = open(self.clip).read()
+    code, lines = self.run_cli('--keep', '1', '-n', 'd.[1-2].exr')
+    self.assertEqual(lines, ["Would add d", "Would remove a", "Would remove b", "Would remove c",
+                             "1 added, 0 already in %s" % self.clip, "3 would be removed"])
+    self.assertEqual(open(self.clip).read(), before)
+    code, lines = self.run_cli('--keep', '1')
+    self.assertEqual(lines[-1], "2 removed")
+    self.assertEqual(self.names(), ['c'])
+
+  def test_verify(self):
+    self.touch('plates', ['a.%04d.exr' % frame for frame in range(1, 6)])
+    self.run_cli('plates/a.[0001-0005].exr')
+    code, lines = self.run_cli('--verify')
+    self.assertEqual((code, lines[-1]), (0, "1 feeds verified, 0 with missing or empty frames"))
+    os.remove(self.path('plates', 'a.0003.exr'))
+    code, lines = self.run_cli('--verify')
+    self.assertEqual(code, 1)
+    self.assertTrue(lines[1].startswith("a : 1 missing (3), newest "))
+
+  def test_no_clip(self):
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+      self.assertEqual(clipCli.main(['a.[1-2].exr']), 2)
+    finally:
+      sys.stderr = stderr
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,148 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clipDocument import UMASK, ClipDocument, clipPath, parseDate, splitFrameRange, versionName
+
+class ClipDocumentTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'shot.clip')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  # A saved clip with a version and a feed per name, the last one current.
+  def clip(self, *names):
+    document = ClipDocument(filename = self.filename)
+    for name in names:
+      uid = document.add_version(name, uid = name).get('uid')
+      document.add_feed(uid, '/plates/%s.[1001-1010].exr' % name, uid = 'f_' + name)
+      document.set_current_version(uid)
+    document.save()
+    return document
+
+  def contents(self):
+    with open(self.filename, 'rb') as f:
+      return f.read()
+
+  def test_round_trip(self):
+    self.clip('a', 'b')
+    saved = self.contents()
+    document = ClipDocument.load(self.filename)
+    self.assertEqual([version.get('uid') for version in document.versions()], ['a', 'b'])
+    self.assertEqual(document.feed_paths(document.feed('f_b')), ['/plates/b.[1001-1010].exr'])
+    self.assertEqual(document.current_version(), 'b')
+    document.save()
+    self.assertEqual(self.contents(), saved)
+    self.assertFalse(document.changed_on_disk())
+
+  def test_modes(self):
+    self.clip('a')
+    self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o666 & ~UMASK if UMASK is not None else 0o600)
+    os.chmod(self.filename, 0o640)
+    self.clip('a', 'b')
+    self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o640)
+
+  def test_changed_on_disk(self):
+    document = self.clip('a')
+    self.clip('a', 'b')
+    self.assertTrue(document.changed_on_disk())
+
+  def test_remove_versions(self):
+    document = self.clip('a', 'b', 'c')
+    self.assertEqual([version.get('uid') for version in document.remove_versions(['c', 'x'])], ['c'])
+    self.assertEqual([feed.get('uid') for feed in document.feeds()], ['f_a', 'f_b'])
+    self.assertEqual(document.current_version(), 'b')
+    document.remove_versions(['a'])
+    self.assertEqual(document.current_version(), 'b')
+    document.remove_versions(['b'])
+    self.assertEqual((document.versions(), document.feeds(), document.current_version()), ([], [], ''))
+    self.assertEqual(document.feeds_element().get('currentVersion'), '')
+
+  def test_diff(self):
+    self.clip('a', 'b', 'c')
+    mine = ClipDocument.load(self.filename)
+    theirs = ClipDocument.load(self.filename)
+    self.assertEqual([change[3:] for change in mine.diff(theirs)], [([], [], []), ([], [], [])])
+    theirs.remove_versions(['a'])
+    uid = theirs.add_version('d', uid = 'd').get('uid')
+    theirs.add_feed(uid, '/plates/d.[1-2].exr', uid = 'f_d')
+    theirs.feed('f_b').find('spans/span/path').text = '/plates/b.[1-5].exr'
+    versions, feeds = mine.diff(theirs)
+    self.assertEqual(versions[0], None)
+    self.assertEqual([elem.get('uid') for elem in versions[3]], ['a'])
+    self.assertEqual(versions[4], [])
+    self.assertEqual([(position, elem.get('uid')) for position, elem in versions[5]], [(2, 'd')])
+    self.assertEqual([elem.get('uid') for elem in feeds[3]], ['f_a'])
+    self.assertEqual([(elem.get('uid'), other.get('uid')) for elem, other in feeds[4]], [('f_b', 'f_b')])
+    self.assertEqual([elem.get('uid') for position, elem in feeds[5]], ['f_d'])
+    # Anything but versions and feeds can't be merged.
+    theirs.track().find('trackType').text = 'audio'
+    self.assertEqual(mine.diff(theirs), None)
+
+  def test_normalize(self):
+    document = self.clip('a', 'b')
+    self.assertEqual(document.normalize('source', { 'f_a': 'someone' }), 7)
+    self.assertEqual(document.version('a').find('name').text, 'a')
+    self.assertEqual(document.feed('f_a').find('userData/user').text, 'someone')
+    self.assertEqual(document.feed('f_b').find('userData/shotType').text, 'source')
+    self.assertEqual(document.normalize('source', { 'f_b': 'someone' }), 1)
+    self.assertEqual(document.normalize('source'), 0)
+
+  def test_superseded_versions(self):
+    document = self.clip('a', 'b', 'c', 'd')
+    document.normalize('source')
+    document.feed('f_c').find('userData/shotType').text = 'comp'
+    self.assertEqual(document.superseded_versions(1), ['a', 'b'])
+    self.assertEqual(document.superseded_versions(3), [])
+    # Versions without a type are a type of their own.
+    uid = document.add_version('e', uid = 'e').get('uid')
+    document.add_feed(uid, '/plates/e.mov', uid = 'f_e')
+    self.assertEqual(document.superseded_versions(0), ['a', 'b', 'd', 'c', 'e'])
+
+  def test_offline_versions(self):
+    plates = os.path.join(self.directory, 'plates')
+    os.mkdir(plates)
+    document = ClipDocument(filename = self.filename)
+    for name, path in (('a', 'a.[1-2].exr'), ('b', 'b.[1-2].exr'), ('c', 'c.mov'), ('d', 'd.mov')):
+      document.add_feed(document.add_version(name, uid = name).get('uid'), os.path.join(plates, path))
+    for name in ('a.1.exr', 'a.2.exr', 'c.mov'):
+      open(os.path.join(plates, name), 'w').close()
+    self.assertEqual(document.offline_versions(), ['b', 'd'])
+
+  def test_paths(self):
+    self.assertEqual(clipPath('/p/a.%04d.exr', 1, 10), '/p/a.[0001-0010].exr')
+    self.assertEqual(clipPath('/p/a.##.exr', 1, 10), '/p/a.[01-10].exr')
+    self.assertEqual(clipPath('/p/a.[1-2].exr', 1, 10), '/p/a.[1-2].exr')
+    self.assertEqual(clipPath('/p/a.mov', 1, 10), '/p/a.mov')
+    self.assertEqual(splitFrameRange('/p/a.[1001-1010].exr'), ('/p/a..exr', 1001, 1010))
+    self.assertEqual(splitFrameRange('/p/a.mov'), ('/p/a.mov', None, None))
+    self.assertEqual([versionName(path) for path in ('/p/plate_v001.%04d.exr', '/p/plate_%04d_left.exr', '/p/take.mov')],
+                     ['plate_v001', 'plate_left', 'take'])
+
+  def test_dates(self):
+    expected = time.mktime((2015, 3, 1, 10, 21, 35, 0, 0, -1))
+    for text in ('2015/03/01 10:21:35', '2015-03-01 10:21:35', '2015-03-01T10:21:35', ' Sun Mar 01 10:21:35 2015 '):
+      self.assertEqual(parseDate(text), expected, text)
+    self.assertEqual(parseDate('2015/03/01 10:21'), expected - 35)
+    for text in ('', None, 'yesterday', '2015/13/01 10:21:35'):
+      self.assertEqual(parseDate(text), None, text)
+    # Dates sort by time, whatever their format.
+    texts = ['2016-01-01 00:00:00', '2015/03/01 10:21:35', 'Mon Mar 02 10:21:35 2015']
+    self.assertEqual(sorted(texts, key = parseDate), [texts[1], texts[2], texts[0]])
+
+  # Frame ranges compare as numbers, after the path without them.
+  def test_frame_range_keys(self):
+    paths = ['/p/b.[1-2].exr', '/p/a.[10-20].exr', '/p/a.mov', '/p/a.[2-30].exr', '/p/a.[2-4].exr']
+    self.assertEqual(sorted(paths, key = splitFrameRange), ['/p/a.[2-4].exr', '/p/a.[2-30].exr', '/p/a.[10-20].exr', '/p/a.mov', '/p/b.[1-2].exr'])
+    self.assertEqual(splitFrameRange('/p/a.[0998-1002,1005].exr'), ('/p/a..exr', 998, 1005))
+    self.assertEqual(splitFrameRange('/p/a.%04d.exr'), ('/p/a.%04d.exr', None, None))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clipDocument import ClipDocument
+from clipJournal import ClipJournal, STALE_SUFFIX
+
+class ClipJournalTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'shot.clip')
+    document = ClipDocument(filename = self.filename)
+    for name in ('a', 'b', 'c'):
+      document.add_feed(document.add_version(name, uid = name).get('uid'), '/p/%s.[1-2].exr' % name, uid = 'f_' + name)
+    document.set_current_version('c')
+    document.save()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  # The document and its journal, replayed.
+  def load(self):
+    document = ClipDocument.load(self.filename)
+    journal = ClipJournal(self.filename)
+    return document, journal, journal.replay(document)
+
+  def record_edits(self):
+    document, journal, replayed = self.load()
+    # versions/version a, then its name.
+    path = [1, 0]
+    journal.record({ 'op': 'attr', 'path': path, 'name': 'note', 'value': 'first' })
+    journal.record({ 'op': 'text', 'path': path + [0], 'text': 'renamed' },
+                   { 'op': 'remove_versions', 'uids': ['c'] })
+    journal.record({ 'op': 'normalize', 'shotType': 'source', 'users': {} })
+    journal.close()
+    return journal
+
+  def test_replay(self):
+    self.assertEqual(self.load()[2], 0)
+    self.record_edits()
+    document, journal, replayed = self.load()
+    self.assertEqual(replayed, 4)
+    version = document.version('a')
+    self.assertEqual((version.get('note'), version.find('name').text), ('first', 'renamed'))
+    self.assertEqual([version.get('uid') for version in document.versions()], ['a', 'b'])
+    self.assertEqual(document.current_version(), 'b')
+    self.assertEqual(document.feed('f_b').find('userData/shotType').text, 'source')
+    self.assertTrue(document.dirty)
+    journal.close()
+
+  # A line cut short by a crash is dropped, the edits before it kept.
+  def test_truncated(self):
+    journal = self.record_edits()
+    with open(journal.filename, 'ab') as f:
+      f.write(b'{"op":"current","ui')
+    document, journal, replayed = self.load()
+    self.assertEqual(replayed, 4)
+    journal.close()
+    self.assertEqual(self.load()[2], 4)
+
+  # A journal written against another version of the clip isn't replayed.
+  def test_stale(self):
+    journal = self.record_edits()
+    document = ClipDocument.load(self.filename)
+    document.remove_versions(['a'])
+    document.save()
+    document, journal, replayed = self.load()
+    self.assertEqual(replayed, None)
+    self.assertEqual(len(document.versions()), 2)
+    self.assertFalse(journal.exists())
+    self.assertTrue(os.path.exists(self.filename + STALE_SUFFIX))
+
+  # Once the clip is saved, only the edits made since are kept.
+  def test_compact(self):
+    document, journal, replayed = self.load()
+    journal.record({ 'op': 'current', 'uid': 'a' })
+    document.apply_edit({ 'op': 'current', 'uid': 'a' })
+    mark = journal.mark()
+    snapshot = document.snapshot()
+    journal.record({ 'op': 'current', 'uid': 'b' })
+    journal.compact(snapshot.save(self.filename)[2], mark)
+    document, journal, replayed = self.load()
+    self.assertEqual((replayed, document.current_version()), (1, 'b'))
+    journal.compact(document.signature[2], journal.mark())
+    self.assertFalse(journal.exists())
+
+if __name__ == '__main__':
+  unittest.main()
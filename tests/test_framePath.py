@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framePath import parseFramePath, parseFramePaths, clearCache
+
+class FramePathTest(unittest.TestCase):
+  def setUp(self):
+    clearCache()
+
+  def test_specs(self):
+    for path, head, spec, tail, padding, ranges in (
+        ('/p/plate.%04d.exr', '/p/plate.', '%04d', '.exr', 4, ()),
+        ('/p/plate.%d.exr', '/p/plate.', '%d', '.exr', 0, ()),
+        ('/p/plate.####.exr', '/p/plate.', '####', '.exr', 4, ()),
+        ('/p/plate.@@@.exr', '/p/plate.', '@@@', '.exr', 3, ()),
+        ('/p/plate.[1001-1003].exr', '/p/plate.', '[1001-1003]', '.exr', 4, ((1001, 1003),)),
+        ('/p/plate.[1-5,7,9-10].exr', '/p/plate.', '[1-5,7,9-10]', '.exr', 1, ((1, 5), (7, 7), (9, 10))),
+        ('/p/plate.[-5--1].exr', '/p/plate.', '[-5--1]', '.exr', 1, ((-5, -1),)),
+        ('/p/plate_v001.%04d', '/p/plate_v001.', '%04d', '', 4, ())):
+      self.assertEqual(tuple(parseFramePath(path)), (head, spec, tail, padding, ranges), path)
+
+  # The spec ends the file name or is followed by a . or _. Whatever comes
+  # before it is the head : the scanner finds name1001.exr too.
+  def test_delimiters(self):
+    for path in ('/p/plate.%04d.exr', '/p/plate_%04d_left.exr', '/p/plate%04d.exr',
+                 '/p/plate[1-10].exr', '/p/plate.%V.%04d.exr', '/p/%d', '/p/plate.####.exr.bak'):
+      self.assertNotEqual(parseFramePath(path), None, path)
+    for path in ('/p/100%done.exr', '/p/plate.%04dx.exr', '/p/#1 take.exr', '/p/plate.[1-5]-left.exr',
+                 '/p/plate.exr', '/p/plate.1001.exr', '/p/plate.[a-b].exr', '/p/plate.[1-5]/a.exr'):
+      self.assertEqual(parseFramePath(path), None, path)
+
+  # The last spec of the name that is one wins.
+  def test_last_spec(self):
+    self.assertEqual(parseFramePath('/p/a.%02d.b.####.exr').spec, '####')
+    self.assertEqual(parseFramePath('/p/a.%02d.100%done.exr').spec, '%02d')
+
+  def test_forms(self):
+    parsed = parseFramePath('/p/plate.[0998-1002].exr')
+    self.assertEqual((parsed.first, parsed.last), (998, 1002))
+    self.assertEqual(parsed.frame(999), '/p/plate.0999.exr')
+    self.assertEqual(parsed.printf(), '/p/plate.%04d.exr')
+    self.assertEqual(parsed.hashes(), '/p/plate.####.exr')
+    self.assertEqual(parsed.spanned([(1, 2), (5, 5)]).path(), '/p/plate.[0001-0002,0005-0005].exr')
+    unpadded = parseFramePath('/p/plate.%d.exr')
+    self.assertEqual((unpadded.printf(), unpadded.hashes(), unpadded.frame(7)), ('/p/plate.%d.exr', '/p/plate.#.exr', '/p/plate.7.exr'))
+
+  def test_many(self):
+    paths = ['/p/a.%04d.exr', '/p/b.mov', '/p/a.%04d.exr', '/p/c.[1-2].exr']
+    self.assertEqual([parsed and parsed.spec for parsed in parseFramePaths(paths)], ['%04d', None, '%04d', '[1-2]'])
+    self.assertEqual(parseFramePaths(paths), [parseFramePath(path) for path in paths])
+
+if __name__ == '__main__':
+  unittest.main()
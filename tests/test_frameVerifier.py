@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frameVerifier import FrameVerifier, mergeStatuses, frameRanges
+
+class FrameVerifierTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    for frame in range(1, 11):
+      if frame not in (4, 5):
+        self.write('r.%04d.exr' % frame, '' if frame == 9 else 'x')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def write(self, name, data):
+    with open(self.path(name), 'w') as f:
+      f.write(data)
+
+  def test_missing_and_empty(self):
+    path = self.path('r.[0001-0010].exr')
+    status = FrameVerifier().verify([path])[path]
+    self.assertEqual((status.frames, status.missing, status.empty), (10, [4, 5], [9]))
+    self.assertEqual(status.newest, max(os.stat(self.path(name)).st_mtime for name in os.listdir(self.directory)))
+    self.assertTrue(status.text(ranges = True).startswith("2 missing (4-5), 1 empty (9), newest "))
+
+  def test_rewritten_in_place(self):
+    path = self.path('r.[0001-0010].exr')
+    verifier = FrameVerifier()
+    self.assertEqual(verifier.verify([path])[path].empty, [9])
+    self.write('r.0009.exr', 'x')
+    self.assertEqual(verifier.verify([path])[path].empty, [])
+    self.assertEqual(verifier.cached(path).empty, [])
+
+  def test_offline_unknown_and_movies(self):
+    self.write('m.mov', 'x')
+    paths = [self.path('gone/g.[1-3].exr'), self.path('p.%04d.exr'), self.path('m.mov'), self.path('n.mov')]
+    statuses = []
+    results = FrameVerifier(threads = 2, queue_size = 1).verify(paths, statuses.extend)
+    self.assertEqual([results[path].text().split(',')[0] for path in paths], ["offline", "unknown", "ok", "offline"])
+    self.assertEqual(sorted(status.path for status in statuses), sorted(paths))
+
+  def test_merge(self):
+    first, second = self.path('r.[0001-0005].exr'), self.path('r.[0006-0010].exr')
+    results = FrameVerifier().verify([first, second])
+    merged = mergeStatuses([results[first], results[second]])
+    self.assertEqual((merged.frames, merged.missing, merged.empty, merged.ok()), (10, [4, 5], [9], False))
+    self.assertEqual(frameRanges([5, 1, 2, 3, 9]), "1-3, 5, 9")
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,76 @@
+import os
+import pwd
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ownerResolver import OwnerResolver, UNKNOWN
+
+class OwnerResolverTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.results = []
+    self.done = threading.Event()
+    self.resolver = OwnerResolver(self.callback)
+
+  def tearDown(self):
+    self.resolver.close()
+    shutil.rmtree(self.directory)
+
+  def callback(self, results):
+    self.results.append(sorted(results))
+    self.done.set()
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def touch(self, name, mtime = None):
+    with open(self.path(name), 'w') as f:
+      f.write('x')
+    if mtime is not None:
+      os.utime(self.path(name), (mtime, mtime))
+
+  # The results of looking paths up.
+  def lookup(self, *names):
+    self.done.clear()
+    for name in names:
+      self.assertEqual(self.resolver.owner(self.path(name)), None)
+    self.assertTrue(self.done.wait(10))
+    return self.results[-1]
+
+  def test_owner(self):
+    self.touch('a')
+    user = pwd.getpwuid(os.getuid()).pw_name
+    self.assertEqual(self.lookup('a', 'missing'), [(self.path('a'), user), (self.path('missing'), UNKNOWN)])
+    self.assertEqual(self.resolver.cached(self.path('a')), user)
+    self.assertEqual(self.resolver.owner(self.path('a')), user)
+    self.resolver.invalidate(self.path('a'))
+    self.assertEqual(self.resolver.cached(self.path('a')), None)
+
+  # Listing a directory again checks the files already cached in it.
+  def test_changed(self):
+    self.touch('a', 1000)
+    self.lookup('a', 'b')
+    self.touch('b')
+    self.touch('a', 2000)
+    user = pwd.getpwuid(os.getuid()).pw_name
+    # b is back with its owner, a kept its own.
+    self.assertEqual(self.lookup('c'), [(self.path('b'), user), (self.path('c'), UNKNOWN)])
+    self.assertEqual(self.resolver.cached(self.path('b')), user)
+
+  @unittest.skipUnless(hasattr(os, 'geteuid') and os.geteuid() == 0, "needs root to chown")
+  def test_replaced(self):
+    self.touch('a', 1000)
+    self.lookup('a')
+    os.chown(self.path('a'), 1, 1)
+    self.touch('a', 2000)
+    owner = self.lookup('b')[0]
+    self.assertEqual(owner[0], self.path('a'))
+    self.assertNotEqual(owner[1], pwd.getpwuid(os.getuid()).pw_name)
+    self.assertEqual(self.resolver.cached(self.path('a')), owner[1])
+
+if __name__ == '__main__':
+  unittest.main()
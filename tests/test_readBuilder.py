@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import nukeStub
+nukeStub.install()
+import readBuilder
+
+def touch(directory, *names):
+  for name in names:
+    with open(os.path.join(directory, name), 'w') as f:
+      f.write('x')
+
+class ReadBuilderTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    nukeStub.reset()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def knobs(self, node):
+    return dict((name, node[name].value()) for name in ('file', 'first', 'last', 'origfirst', 'origlast', 'label'))
+
+  def test_unpadded_range(self):
+    touch(self.directory, *['r.%d.exr' % frame for frame in range(1, 121)])
+    node, = readBuilder.createReadNodes([([self.path('r.[1-120].exr')], 'r')])
+    self.assertEqual(self.knobs(node), { 'file': self.path('r.#.exr'), 'first': 1, 'last': 120, 'origfirst': 1, 'origlast': 120, 'label': 'r' })
+
+  def test_clipped_to_disk(self):
+    touch(self.directory, *['p.%04d.exr' % frame for frame in range(1003, 1009) if frame != 1005])
+    node, = readBuilder.createReadNodes([([self.path('p.[1001-1010].exr')], 'p')])
+    self.assertEqual((node['first'].value(), node['last'].value()), (1003, 1008))
+    self.assertEqual(node['label'].value(), 'p\n1 missing')
+
+  def test_spans_merged(self):
+    node, = readBuilder.createReadNodes([([self.path('s.[1001-1010].exr'), self.path('s.[1020-1030].exr')], 's')])
+    self.assertEqual((node['first'].value(), node['last'].value()), (1001, 1030))
+    self.assertEqual(node['label'].value(), 's\noffline')
+
+  def test_grid_and_contact_sheet(self):
+    nukeStub.nodes.Blur(xpos = 100, ypos = 300)
+    reads = [([self.path('v%d.[1-2].exr' % i)], 'v%d' % i) for i in range(5)]
+    nodes = readBuilder.createReadNodes(reads, contactSheet = True)
+    self.assertEqual([(node.xpos(), node.ypos()) for node in nodes], [(100, 358), (220, 358), (340, 358), (100, 416), (220, 416)])
+    sheet, = nukeStub.allNodes('ContactSheet')
+    self.assertEqual((sheet['rows'].value(), sheet['columns'].value()), (2, 3))
+    self.assertEqual([sheet.input(i) for i in range(5)], nodes)
+
+  def test_movie(self):
+    touch(self.directory, 'm.mov')
+    node, = readBuilder.createReadNodes([([self.path('m.mov')], 'm')])
+    self.assertEqual((node['file'].value(), node['first'].value(), node['label'].value()), (self.path('m.mov'), None, 'm'))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sequenceScanner import scan, findSequence, findSequences, groupFiles
+
+def touch(directory, *names):
+  for name in names:
+    with open(os.path.join(directory, name), 'w') as f:
+      f.write('x')
+
+class SequenceScannerTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def test_padded(self):
+    touch(self.directory, *['p.%04d.exr' % frame for frame in range(1, 11) if frame != 5])
+    sequences = scan(self.directory)
+    self.assertEqual(len(sequences), 1)
+    self.assertEqual(sequences[0].pattern(), self.path('p.%04d.exr'))
+    self.assertEqual(sequences[0].missing(), [5])
+    self.assertEqual(sequences[0].span_paths(), [self.path('p.[0001-0004].exr'), self.path('p.[0006-0010].exr')])
+
+  def test_unpadded(self):
+    touch(self.directory, *['r.%d.exr' % frame for frame in range(1, 121)])
+    sequences = scan(self.directory)
+    self.assertEqual(len(sequences), 1)
+    self.assertEqual((sequences[0].first, sequences[0].last), (1, 120))
+    self.assertEqual(sequences[0].pattern(), self.path('r.%d.exr'))
+    self.assertEqual(sequences[0].span_paths(), [self.path('r.[1-120].exr')])
+    for path in ('r.%d.exr', 'r.[1-120].exr', 'r.#.exr'):
+      sequence = findSequence(self.path(path))
+      self.assertEqual((sequence.first, sequence.last, len(sequence.frames)), (1, 120, 120), path)
+    self.assertEqual(findSequence(self.path('r.[1-120].exr')).clipped(1, 120).last, 120)
+
+  def test_four_digits_without_zeros(self):
+    touch(self.directory, *['c.%d.exr' % frame for frame in range(1001, 1011)])
+    self.assertEqual(scan(self.directory)[0].pattern(), self.path('c.%04d.exr'))
+    for path in ('c.%04d.exr', 'c.####.exr', 'c.[1001-1010].exr', 'c.%d.exr'):
+      self.assertEqual(len(findSequence(self.path(path)).frames), 10, path)
+
+  def test_padded_and_longer(self):
+    touch(self.directory, *['q.%04d.exr' % frame for frame in range(990, 1011)])
+    sequences = scan(self.directory)
+    self.assertEqual([(s.padding, s.first, s.last) for s in sequences], [(4, 990, 1010)])
+
+  def test_paddings_apart(self):
+    touch(self.directory, 's.01.exr', 's.02.exr', 's.001.exr', 's.002.exr')
+    sequences = groupFiles(self.directory, os.listdir(self.directory))
+    self.assertEqual([(s.padding, s.frames) for s in sequences], [(2, [1, 2]), (3, [1, 2])])
+    self.assertEqual(findSequence(self.path('s.%03d.exr')).padding, 3)
+    self.assertEqual(findSequence(self.path('s.%d.exr')), None)
+
+  # The frame number follows a . or _, movies are never frames.
+  def test_frame_files(self):
+    touch(self.directory, 'comp_v001.exr', 'comp_v002.exr', 'take_001.mov', 'take_002.MOV', 't_1.exr', 't_2.exr', '0001.dpx', '0002.dpx')
+    self.assertEqual([s.pattern() for s in scan(self.directory)], [self.path('%04d.dpx'), self.path('t_%01d.exr')])
+
+  # Named by a pattern, frames need no separator.
+  def test_find_undelimited(self):
+    touch(self.directory, *['plate%04d.exr' % frame for frame in range(1, 4)] + ['plate.exr', 'platex.exr'])
+    self.assertEqual(scan(self.directory), [])
+    for path in ('plate%04d.exr', 'plate####.exr', 'plate[0001-0003].exr'):
+      self.assertEqual(findSequence(self.path(path)).frames, [1, 2, 3], path)
+
+  def test_find_sequences(self):
+    touch(self.directory, 'a.1.exr', 'a.2.exr', 'b.0001.dpx')
+    found = findSequences([self.path('a.%d.exr'), self.path('b.%04d.dpx'), self.path('c.%04d.exr')])
+    self.assertEqual([s.frames if s is not None else None for s in found], [[1, 2], [1], None])
+
+  def test_find_sequences_threads(self):
+    touch(self.directory, 'a.1.exr')
+    threads = threading.active_count()
+    for i in range(3):
+      findSequences([self.path('a.%d.exr')] * 4)
+    self.assertEqual(threading.active_count(), threads)
+
+  def test_recursive(self):
+    os.mkdir(self.path('sub'))
+    touch(self.directory, 'a.1.exr')
+    touch(self.path('sub'), 'b.1.exr', 'movie.mov')
+    self.assertEqual(len(scan(self.directory)), 1)
+    self.assertEqual([s.prefix for s in scan(self.directory, recursive = True)], ['a.', 'b.'])
+
+if __name__ == '__main__':
+  unittest.main()